@@ -1,10 +1,22 @@
 from django.contrib import admin
-from .models import DatasetSummary
+from .models import DatasetSummary, EquipmentTypeCount, UploadJob
+
+
+class EquipmentTypeCountInline(admin.TabularInline):
+    model = EquipmentTypeCount
+    extra = 0
 
 
 @admin.register(DatasetSummary)
 class DatasetSummaryAdmin(admin.ModelAdmin):
     list_display = ['filename', 'user', 'uploaded_at', 'total_equipment_count']
-    list_filter = ['uploaded_at']
+    list_filter = ['uploaded_at', 'type_counts__equipment_type']
     search_fields = ['filename', 'user__username']
+    inlines = [EquipmentTypeCountInline]
 
+
+@admin.register(UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'status', 'created_at', 'summary']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'user__username']
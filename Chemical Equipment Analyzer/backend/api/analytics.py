@@ -0,0 +1,498 @@
+"""
+Streaming CSV analysis for uploaded equipment datasets.
+
+The upload is read in bounded chunks and every chunk is folded into running
+aggregates, so peak memory depends on the chunk size rather than the file size.
+Only the header is read up front; after that just the five required columns
+are parsed, with explicit dtypes, using pyarrow's CSV reader when installed.
+"""
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from pandas._libs.parsers import STR_NA_VALUES
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # optional fast parser
+    pa = None
+
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Number of rows echoed back to the client in the upload response
+SAMPLE_ROWS = 100
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Version of the analysis output; bump when result() changes so cached
+# analyses of identical uploads are recomputed
+ANALYSIS_VERSION = 5
+
+
+class CSVValidationError(ValueError):
+    """Raised when an uploaded CSV cannot be analyzed"""
+
+
+def get_chunk_size():
+    """Return the configured number of rows read per chunk"""
+    return getattr(settings, 'CSV_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def resolve_column_mapping(columns):
+    """Map required column names to the actual (case-insensitive) CSV headers"""
+    lookup = {}
+    for col in columns:
+        lookup.setdefault(str(col).strip().lower(), col)
+
+    column_mapping = {}
+    missing_columns = []
+    for req_col in REQUIRED_COLUMNS:
+        actual = lookup.get(req_col.lower())
+        if actual is None:
+            missing_columns.append(req_col)
+        else:
+            column_mapping[actual] = req_col
+    return column_mapping, missing_columns
+
+
+class RunningStats:
+    """Welford running count/mean/variance, updated one chunk at a time"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values):
+        """Fold an array of values into the running aggregate"""
+        values = np.asarray(values, dtype=np.float64)
+        n = values.size
+        if n == 0:
+            return
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+        self.merge(n, chunk_mean, chunk_m2)
+
+    def merge(self, count, mean, m2):
+        """Combine with another (count, mean, M2) triple (Chan et al.)"""
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1), matching pandas"""
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with bounded relative error (DDSketch-style)
+
+    Values are counted in logarithmic buckets, so any quantile is returned
+    within ``relative_accuracy`` of the true value and two sketches merge by
+    adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zeros = 0
+        self.count = 0
+
+    def _add_buckets(self, store, magnitudes):
+        if magnitudes.size == 0:
+            return
+        keys, counts = np.unique(
+            np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64),
+            return_counts=True,
+        )
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] += count
+
+    def update(self, values):
+        """Add an array of values"""
+        values = np.asarray(values, dtype=np.float64)
+        self._add_buckets(self.positive, values[values > 0])
+        self._add_buckets(self.negative, -values[values < 0])
+        self.zeros += int((values == 0).sum())
+        self.count += values.size
+
+    def merge(self, other):
+        """Fold another sketch with the same accuracy into this one"""
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def _bucket_value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0 <= q <= 1)"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+        return self._bucket_value(max(self.positive))
+
+
+class ColumnStats(RunningStats):
+    """Running count/mean/variance plus min, max and a quantile sketch"""
+
+    def __init__(self):
+        super().__init__()
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch()
+
+    def merge_group(self, count, mean, m2, minimum, maximum, values):
+        """Fold one group's precomputed moments and its raw values"""
+        self.merge(count, mean, m2)
+        self.min = minimum if self.min is None else min(self.min, minimum)
+        self.max = maximum if self.max is None else max(self.max, maximum)
+        self.sketch.update(values)
+
+    def combine(self, other):
+        """Fold another ColumnStats into this one"""
+        if other.count == 0:
+            return
+        self.merge(other.count, other.mean, other.m2)
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def percentile(self, q):
+        """Sketch estimate of quantile q, clamped to the observed range"""
+        value = self.sketch.quantile(q)
+        if value is None:
+            return None
+        return min(max(value, self.min), self.max)
+
+    def sufficient(self):
+        """Mergeable sufficient statistics: count, sum, sum of squares, min, max"""
+        total = self.mean * self.count
+        return {
+            'count': self.count,
+            'sum': total,
+            'sum_sq': self.m2 + self.mean * total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    def summary(self):
+        """Plain-Python summary of the column"""
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'std': float(np.sqrt(self.variance)),
+            **{f'p{int(q * 100)}': self.percentile(q) for q in QUANTILES},
+        }
+
+
+# Percentiles reported for every column
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class DatasetAggregator:
+    """Accumulate summary statistics over a sequence of cleaned chunks
+
+    Each chunk is grouped by Type once; per-group moments from that single
+    grouped pass are merged into per-type statistics, and the overall
+    statistics are the merge of all groups.
+    """
+
+    def __init__(self):
+        self.count = 0
+        # Keyed by equipment type; None collects rows without a type
+        self.groups = {}
+        self.sample = []
+
+    def _group_stats(self, key):
+        if key not in self.groups:
+            self.groups[key] = {col: ColumnStats() for col in NUMERIC_COLUMNS}
+        return self.groups[key]
+
+    def add_chunk(self, chunk):
+        """Fold one cleaned chunk (standard column names, no missing numerics)"""
+        if len(chunk) == 0:
+            return
+        self.count += len(chunk)
+
+        # Group on factor codes (-1 for a missing type) rather than the
+        # Type column itself, which may be categorical with missing values
+        codes, uniques = pd.factorize(chunk['Type'])
+        grouped = chunk[NUMERIC_COLUMNS].groupby(codes, sort=False)
+        moments = grouped.agg(['count', 'mean', 'var', 'min', 'max'])
+        values = {col: chunk[col].to_numpy() for col in NUMERIC_COLUMNS}
+
+        for code, positions in grouped.indices.items():
+            row = moments.loc[code]
+            stats = self._group_stats(str(uniques[code]) if code >= 0 else None)
+            for col in NUMERIC_COLUMNS:
+                count = int(row[(col, 'count')])
+                var = row[(col, 'var')]
+                stats[col].merge_group(
+                    count,
+                    float(row[(col, 'mean')]),
+                    0.0 if pd.isna(var) else float(var) * (count - 1),
+                    float(row[(col, 'min')]),
+                    float(row[(col, 'max')]),
+                    values[col][positions],
+                )
+
+        if len(self.sample) < SAMPLE_ROWS:
+            head = chunk.head(SAMPLE_ROWS - len(self.sample))
+            # Missing types must serialize as null, not NaN
+            head = head.astype({'Type': object}).where(head.notna(), None)
+            self.sample.extend(head.to_dict('records'))
+
+    def overall(self):
+        """Statistics over all rows, merged from the per-type groups"""
+        overall = {col: ColumnStats() for col in NUMERIC_COLUMNS}
+        for stats in self.groups.values():
+            for col in NUMERIC_COLUMNS:
+                overall[col].combine(stats[col])
+        return overall
+
+    def result(self):
+        """Return the final aggregates as plain Python types"""
+        overall = self.overall()
+        by_type = {key: stats for key, stats in self.groups.items() if key is not None}
+        type_counts = Counter({
+            key: stats[NUMERIC_COLUMNS[0]].count for key, stats in by_type.items()
+        })
+
+        return {
+            'total_equipment_count': self.count,
+            'avg_flowrate': overall['Flowrate'].mean,
+            'avg_pressure': overall['Pressure'].mean,
+            'avg_temperature': overall['Temperature'].mean,
+            'equipment_type_distribution': dict(type_counts.most_common()),
+            'sufficient_statistics': {
+                col: overall[col].sufficient() for col in NUMERIC_COLUMNS
+            },
+            'statistics': {
+                'overall': {col: overall[col].summary() for col in NUMERIC_COLUMNS},
+                'by_type': {
+                    key: {col: stats[col].summary() for col in NUMERIC_COLUMNS}
+                    for key, stats in by_type.items()
+                },
+            },
+            'raw_data': self.sample,
+        }
+
+
+def merge_sufficient_statistics(items):
+    """Combine per-dataset sufficient statistics into overall column stats
+
+    items is an iterable of {column: {count, sum, sum_sq, min, max}} dicts as
+    stored on DatasetSummary. Each dataset is reduced to (count, mean, M2)
+    and merged pairwise, which is numerically safer than subtracting the
+    grand totals. sum_sq may be None for datasets stored before it was
+    recorded; std is then reported as None.
+    """
+    merged = {col: RunningStats() for col in NUMERIC_COLUMNS}
+    extremes = {col: [None, None] for col in NUMERIC_COLUMNS}
+    has_spread = {col: True for col in NUMERIC_COLUMNS}
+
+    for item in items:
+        for col in NUMERIC_COLUMNS:
+            stats = item.get(col)
+            if not stats or not stats['count']:
+                continue
+            count = stats['count']
+            mean = stats['sum'] / count
+            if stats.get('sum_sq') is None:
+                has_spread[col] = False
+                m2 = 0.0
+            else:
+                m2 = max(stats['sum_sq'] - stats['sum'] * mean, 0.0)
+            merged[col].merge(count, mean, m2)
+
+            low, high = extremes[col]
+            if stats.get('min') is not None:
+                extremes[col][0] = stats['min'] if low is None else min(low, stats['min'])
+            if stats.get('max') is not None:
+                extremes[col][1] = stats['max'] if high is None else max(high, stats['max'])
+
+    return {
+        col: {
+            'count': merged[col].count,
+            'sum': merged[col].mean * merged[col].count,
+            'mean': merged[col].mean if merged[col].count else None,
+            'std': float(np.sqrt(merged[col].variance)) if has_spread[col] else None,
+            'min': extremes[col][0],
+            'max': extremes[col][1],
+        }
+        for col in NUMERIC_COLUMNS
+    }
+
+
+def read_header(file):
+    """Read only the header row, then rewind the file for the full parse"""
+    columns = pd.read_csv(file, nrows=0).columns
+    file.seek(0)
+    return columns
+
+
+def clean_chunk(chunk, column_mapping, coerce=False):
+    """Rename to standard columns, coerce numerics and drop incomplete rows
+
+    Infinite values (an 'inf' literal, or one that overflows like 1e400
+    under pyarrow) are treated as missing.
+    """
+    chunk = chunk.rename(columns=column_mapping)
+    if coerce:
+        for col in NUMERIC_COLUMNS:
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+    chunk[NUMERIC_COLUMNS] = chunk[NUMERIC_COLUMNS].replace([np.inf, -np.inf], np.nan)
+    return chunk.dropna(subset=NUMERIC_COLUMNS)
+
+
+def _iter_pandas_chunks(file, column_mapping, chunksize, coerce):
+    """Parse the required columns with the pandas C engine"""
+    actual = {std: col for col, std in column_mapping.items()}
+    dtype = {actual['Equipment Name']: object, actual['Type']: 'category'}
+    if not coerce:
+        dtype.update({actual[col]: np.float64 for col in NUMERIC_COLUMNS})
+
+    reader = pd.read_csv(
+        file, usecols=list(column_mapping), dtype=dtype, chunksize=chunksize
+    )
+    with reader:
+        for chunk in reader:
+            yield clean_chunk(chunk, column_mapping, coerce)
+
+
+def _iter_arrow_chunks(file, column_mapping, chunksize):
+    """Parse the required columns with pyarrow's multithreaded reader"""
+    actual = {std: col for col, std in column_mapping.items()}
+    column_types = {actual[col]: pa.float64() for col in NUMERIC_COLUMNS}
+    column_types[actual['Equipment Name']] = pa.string()
+    column_types[actual['Type']] = pa.dictionary(pa.int32(), pa.string())
+
+    reader = pa_csv.open_csv(
+        file,
+        # Arrow batches by bytes; assume ~64 bytes per row
+        read_options=pa_csv.ReadOptions(block_size=max(1 << 20, chunksize * 64)),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(column_mapping),
+            column_types=column_types,
+            # Missing values are spelled the same as for the pandas engine
+            null_values=sorted(STR_NA_VALUES),
+            strings_can_be_null=True,
+        ),
+    )
+    for batch in reader:
+        yield clean_chunk(batch.to_pandas(), column_mapping)
+
+
+def iter_clean_chunks(file, column_mapping, chunksize, coerce=False):
+    """Yield cleaned chunks holding only the five required columns
+
+    The typed parse fails with ValueError on non-numeric values; pass
+    coerce=True to parse leniently and treat them as missing instead.
+    """
+    if pa is not None and not coerce:
+        return _iter_arrow_chunks(file, column_mapping, chunksize)
+    return _iter_pandas_chunks(file, column_mapping, chunksize, coerce)
+
+
+def _aggregate(chunks, writer=None):
+    """Fold a stream of cleaned chunks into a new aggregator"""
+    aggregator = DatasetAggregator()
+    for chunk in chunks:
+        aggregator.add_chunk(chunk)
+        if writer is not None:
+            writer.append(chunk)
+    return aggregator
+
+
+def _analyze_pass(file, column_mapping, chunksize, coerce, store_as):
+    """Run one parse over the file, optionally storing the cleaned rows
+
+    Returns the aggregator and, for stored datasets, the anomaly report
+    computed over the stored columns before they are published.
+    """
+    from .anomalies import detect_anomalies
+    from .storage import DatasetWriter
+
+    writer = DatasetWriter(store_as) if store_as else None
+    try:
+        aggregator = _aggregate(
+            iter_clean_chunks(file, column_mapping, chunksize, coerce), writer
+        )
+    except Exception:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    anomalies = None
+    if writer is not None:
+        if aggregator.count:
+            anomalies = writer.commit(
+                finalize=lambda dataset: detect_anomalies(dataset, aggregator)
+            )
+        else:
+            writer.abort()
+    return aggregator, anomalies
+
+
+def analyze_csv(file, chunksize=None, store_as=None):
+    """Analyze a CSV file object in bounded chunks and return the summary
+
+    When store_as is given, the cleaned rows are also written to that
+    dataset path (see api.storage) during the same pass, and outliers are
+    flagged over the stored columns (see api.anomalies).
+    """
+    chunksize = chunksize or get_chunk_size()
+
+    column_mapping, missing_columns = resolve_column_mapping(read_header(file))
+    if missing_columns:
+        raise CSVValidationError(
+            f'Missing required columns: {", ".join(missing_columns)}'
+        )
+
+    try:
+        aggregator, anomalies = _analyze_pass(
+            file, column_mapping, chunksize, False, store_as
+        )
+    except ValueError:
+        # Non-numeric values in a numeric column: reparse with coercion
+        file.seek(0)
+        aggregator, anomalies = _analyze_pass(
+            file, column_mapping, chunksize, True, store_as
+        )
+
+    if aggregator.count == 0:
+        raise CSVValidationError('No valid data rows found after processing')
+
+    result = aggregator.result()
+    if anomalies is not None:
+        result['anomalies'] = anomalies
+    return result
@@ -0,0 +1,129 @@
+"""
+Vectorized outlier detection over stored datasets.
+
+Every row is checked against the statistics of its own equipment type with
+two tests per numeric column:
+
+    zscore  |value - mean| > ANOMALY_Z_THRESHOLD * std
+    iqr     value outside [p25 - k * IQR, p75 + k * IQR], k = ANOMALY_IQR_MULTIPLIER
+
+Thresholds come from the statistics gathered while parsing, so detection is a
+single blocked pass over the memory-mapped columns. Flagged rows are stored
+next to the dataset as their indices plus a bitmask of the failed tests.
+"""
+from itertools import product
+
+import numpy as np
+from django.conf import settings
+
+from .analytics import NUMERIC_COLUMNS
+
+METHODS = ('zscore', 'iqr')
+
+# Bit in anomaly_flags.u1 for each (column, method) test
+FLAG_BITS = {
+    key: 1 << position
+    for position, key in enumerate(product(NUMERIC_COLUMNS, METHODS))
+}
+
+ROWS_FILE = 'anomaly_rows.i8'
+FLAGS_FILE = 'anomaly_flags.u1'
+
+# Rows checked per block, bounding the temporary arrays
+BLOCK_ROWS = 1 << 20
+
+
+def _thresholds(dataset, aggregator):
+    """Per-type-code threshold arrays for every column and test
+
+    Arrays have one entry per stored type plus a last entry holding the
+    overall statistics, which type code -1 (missing type) indexes.
+    """
+    z = getattr(settings, 'ANOMALY_Z_THRESHOLD', 3.0)
+    k = getattr(settings, 'ANOMALY_IQR_MULTIPLIER', 1.5)
+    overall = aggregator.overall()
+    per_code = [aggregator.groups.get(name, overall) for name in dataset.types] + [overall]
+
+    thresholds = {}
+    for col in NUMERIC_COLUMNS:
+        mean = np.array([stats[col].mean for stats in per_code])
+        std = np.array([np.sqrt(stats[col].variance) for stats in per_code])
+        q1 = np.array([stats[col].percentile(0.25) for stats in per_code], dtype=np.float64)
+        q3 = np.array([stats[col].percentile(0.75) for stats in per_code], dtype=np.float64)
+        iqr = q3 - q1
+        thresholds[col] = {
+            'mean': mean,
+            # A constant column has no z-score outliers
+            'z_limit': np.where(std > 0, z * std, np.inf),
+            'low': q1 - k * iqr,
+            'high': q3 + k * iqr,
+        }
+    return thresholds
+
+
+def detect_anomalies(dataset, aggregator):
+    """Flag outlier rows of a stored dataset and return the counts
+
+    aggregator is the DatasetAggregator that produced the dataset's
+    statistics. Writes the flagged row indices and their test bitmasks into
+    the dataset directory.
+    """
+    thresholds = _thresholds(dataset, aggregator)
+    column_counts = {col: {method: 0 for method in METHODS} for col in NUMERIC_COLUMNS}
+    type_counts = np.zeros(len(dataset.types) + 1, dtype=np.int64)
+    flagged_rows = []
+    flagged_bits = []
+
+    for start in range(0, len(dataset), BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, len(dataset))
+        codes = np.asarray(dataset.type_codes[start:stop])
+        flags = np.zeros(stop - start, dtype=np.uint8)
+
+        for col in NUMERIC_COLUMNS:
+            values = np.asarray(dataset.numeric[col][start:stop])
+            limits = thresholds[col]
+            tests = {
+                'zscore': np.abs(values - limits['mean'][codes]) > limits['z_limit'][codes],
+                'iqr': (values < limits['low'][codes]) | (values > limits['high'][codes]),
+            }
+            for method, hits in tests.items():
+                column_counts[col][method] += int(hits.sum())
+                flags[hits] |= FLAG_BITS[(col, method)]
+
+        hit_positions = np.flatnonzero(flags)
+        flagged_rows.append(hit_positions + start)
+        flagged_bits.append(flags[hit_positions])
+        # Rows without a type (code -1) are counted in the last slot
+        hit_codes = np.where(codes[hit_positions] < 0, len(dataset.types), codes[hit_positions])
+        type_counts += np.bincount(hit_codes, minlength=len(type_counts))
+
+    rows = np.concatenate(flagged_rows) if flagged_rows else np.empty(0, dtype=np.int64)
+    bits = np.concatenate(flagged_bits) if flagged_bits else np.empty(0, dtype=np.uint8)
+    dataset.write_array(ROWS_FILE, rows.astype(np.int64))
+    dataset.write_array(FLAGS_FILE, bits.astype(np.uint8))
+
+    by_type = {name: int(count) for name, count in zip(dataset.types, type_counts) if count}
+    return {
+        'total': int(rows.size),
+        'by_column': column_counts,
+        'by_type': by_type,
+        'z_threshold': getattr(settings, 'ANOMALY_Z_THRESHOLD', 3.0),
+        'iqr_multiplier': getattr(settings, 'ANOMALY_IQR_MULTIPLIER', 1.5),
+    }
+
+
+def load_anomalies(dataset):
+    """Memory-map the flagged row indices and bitmasks, or None if absent"""
+    rows = dataset.read_array(ROWS_FILE, np.int64)
+    flags = dataset.read_array(FLAGS_FILE, np.uint8)
+    if rows is None or flags is None:
+        return None
+    return rows, flags
+
+
+def describe_flags(bits):
+    """List the failed tests encoded in one row's bitmask"""
+    return [
+        {'column': col, 'method': method}
+        for (col, method), bit in FLAG_BITS.items() if bits & bit
+    ]
@@ -0,0 +1,71 @@
+"""
+Async function views on top of DRF.
+
+DRF 3.14 only dispatches sync views. async_api_view is the async counterpart
+of @api_view: authentication, permission checks and content negotiation run
+in a worker thread (token lookups may hit the database), then the coroutine
+handler runs on the event loop and awaits its own database work. The usual
+@permission_classes and @renderer_classes decorators apply unchanged.
+
+Under ASGI these views wait on the event loop instead of a request thread;
+under WSGI Django runs them to completion like any other view.
+"""
+import inspect
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers are coroutines"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), None)
+            else:
+                handler = None
+            if handler is None:
+                self.http_method_not_allowed(request, *args, **kwargs)
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                # Everything but DRF's own OPTIONS handler
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_api_view(http_method_names):
+    """Turn a coroutine function into an AsyncAPIView, like @api_view"""
+    def decorator(func):
+        attrs = {
+            'http_method_names': [method.lower() for method in http_method_names] + ['options'],
+            '__doc__': func.__doc__,
+        }
+        for setting in (
+            'renderer_classes', 'parser_classes', 'authentication_classes',
+            'throttle_classes', 'permission_classes',
+        ):
+            if hasattr(func, setting):
+                attrs[setting] = getattr(func, setting)
+
+        async def handler(self, *args, **kwargs):
+            return await func(*args, **kwargs)
+
+        for method in http_method_names:
+            attrs[method.lower()] = handler
+
+        view_class = type(func.__name__, (AsyncAPIView,), attrs)
+        view_class.__module__ = func.__module__
+        return view_class.as_view()
+    return decorator
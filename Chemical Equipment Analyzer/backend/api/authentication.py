@@ -0,0 +1,78 @@
+"""
+Token authentication backed by an in-process cache.
+
+DRF's TokenAuthentication loads the Token and its User from the database on
+every request. CachedTokenAuthentication remembers resolved tokens for
+TOKEN_CACHE_TTL seconds, so a cache hit costs one dictionary lookup.
+
+Deleting a token (logout, rotation, admin) evicts it from this process's
+cache immediately; other processes drop it when their entry expires, so
+TOKEN_CACHE_TTL bounds how long a revoked token can keep working there.
+When TOKEN_EXPIRY_SECONDS is set, tokens older than that are rejected.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import LRUCache
+
+_tokens = LRUCache(getattr(settings, 'TOKEN_CACHE_MAX_ENTRIES', 10000))
+
+
+def token_expiry():
+    """Lifetime of a token, or None if tokens do not expire"""
+    seconds = getattr(settings, 'TOKEN_EXPIRY_SECONDS', None)
+    return timedelta(seconds=seconds) if seconds else None
+
+
+def token_expires_at(token):
+    """When a token stops being accepted, or None"""
+    expiry = token_expiry()
+    return token.created + expiry if expiry else None
+
+
+def is_token_expired(token):
+    expires_at = token_expires_at(token)
+    return expires_at is not None and expires_at <= timezone.now()
+
+
+def forget_token(key):
+    """Evict a token from this process's cache"""
+    _tokens.pop(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that caches resolved tokens in memory"""
+
+    def authenticate_credentials(self, key):
+        now = time.monotonic()
+        entry = _tokens.get(key)
+        if entry is not None and entry[0] > now:
+            _, user, token = entry
+            return user, token
+
+        user, token = self._load(key)
+        valid_for = getattr(settings, 'TOKEN_CACHE_TTL', 60)
+        expires_at = token_expires_at(token)
+        if expires_at is not None:
+            # Never serve a token from the cache past its expiry
+            valid_for = min(valid_for, (expires_at - timezone.now()).total_seconds())
+        _tokens.set(key, (now + valid_for, user, token))
+        return user, token
+
+    def _load(self, key):
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if is_token_expired(token):
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        return token.user, token
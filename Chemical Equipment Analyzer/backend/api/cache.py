@@ -0,0 +1,142 @@
+"""
+Per-user response cache with conditional GET support.
+
+Serialized responses are kept in a bounded in-process LRU keyed by user,
+request path and the user's current cache generation. The generation is a
+random token stored in Django's cache framework (shared with the worker
+processes that save summaries); saving or deleting a user's summaries
+replaces it, which invalidates all of that user's entries at once.
+
+Cached responses carry a weak ETag and Last-Modified (the time of the last
+invalidation). A request whose If-None-Match or If-Modified-Since still
+matches gets a 304 without touching the database.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _generation_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(user_id):
+    return f'api:responses:{user_id}'
+
+
+def get_generation(user_id):
+    """Current (token, modified timestamp) of a user's cached responses"""
+    key = _generation_key(user_id)
+    generation = _generation_cache().get(key)
+    if generation is None:
+        _generation_cache().add(key, (uuid.uuid4().hex, int(time.time())), timeout=None)
+        generation = _generation_cache().get(key)
+    return generation
+
+
+def invalidate_user(user_id):
+    """Drop every cached response of a user"""
+    if user_id is not None:
+        _generation_cache().set(
+            _generation_key(user_id), (uuid.uuid4().hex, int(time.time())), timeout=None
+        )
+
+
+def invalidate_user_on_commit(user_id):
+    """Invalidate a user's responses once the current transaction commits"""
+    transaction.on_commit(partial(invalidate_user, user_id))
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entries"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_responses = LRUCache(getattr(settings, 'RESPONSE_CACHE_MAX_ENTRIES', 512))
+
+
+def _etag(data):
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return 'W/"%s"' % hashlib.md5(body.encode('utf-8')).hexdigest()
+
+
+def _not_modified(request, etag, modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Weak comparison: ignore the W/ prefix on both sides
+        wanted = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+        return '*' in wanted or etag.removeprefix('W/') in wanted
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and modified <= since
+
+
+def cached_response(request, build):
+    """Serve a user's GET response from the cache, building it on a miss
+
+    build() returns a Response; only 200 responses are cached.
+    """
+    token, modified = get_generation(request.user.pk)
+    key = (request.user.pk, request.get_full_path(), token)
+    entry = _responses.get(key)
+    if entry is None:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        entry = (response.data, _etag(response.data))
+        _responses.set(key, entry)
+
+    data, etag = entry
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format != 'json':
+        # Each representation (columnar, msgpack, ...) gets its own validator
+        etag = '%s-%s"' % (etag[:-1], renderer.format)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(modified),
+        # Clients may store the response but must revalidate it
+        'Cache-Control': 'private, no-cache',
+        'Vary': 'Accept, Authorization, Cookie',
+    }
+    if _not_modified(request, etag, modified):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(data, headers=headers)
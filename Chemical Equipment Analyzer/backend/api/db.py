@@ -0,0 +1,103 @@
+"""
+Database tuning and read routing.
+
+SQLite connections are switched to WAL journaling with a busy timeout as
+they open, so readers never wait for a writer and concurrent writers queue
+instead of failing with "database is locked".
+
+Views wrapped in read_only_view send their queries to the READ_REPLICA_ALIAS
+database when one is configured (a replica, or for SQLite a second read-only
+connection to the same file). A user who changed data within the last
+REPLICA_STICKY_SECONDS keeps reading from the primary, so a lagging replica
+cannot serve them their own stale history.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply WAL and busy-timeout pragmas to new SQLite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    timeout_ms = int(getattr(settings, 'SQLITE_BUSY_TIMEOUT', 20) * 1000)
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA busy_timeout = {timeout_ms}')
+        if not connection.settings_dict.get('READ_ONLY'):
+            journal_mode = getattr(settings, 'SQLITE_JOURNAL_MODE', 'WAL')
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+            if journal_mode.upper() == 'WAL':
+                # Durable at checkpoints; safe with WAL and much cheaper per commit
+                cursor.execute('PRAGMA synchronous = NORMAL')
+
+
+def replica_alias():
+    """Alias reads may be routed to, or None if no replica is configured"""
+    alias = getattr(settings, 'READ_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _read_alias_for(request):
+    alias = replica_alias()
+    if alias is None or not request.user.is_authenticated:
+        return alias
+    from .cache import get_generation
+
+    # The cache generation changes on every write of the user's summaries
+    _, modified = get_generation(request.user.pk)
+    if time.time() - modified < getattr(settings, 'REPLICA_STICKY_SECONDS', 5):
+        return None
+    return alias
+
+
+def read_only_view(view):
+    """Route the queries of a read-only view to the read replica
+
+    Apply below @api_view (or @async_api_view) so the request is already
+    authenticated.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # The database work of the view runs in threads that copy this context
+            token = _read_alias.set(await sync_to_async(_read_alias_for)(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _read_alias.set(_read_alias_for(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Send reads inside read_only_view to the replica; everything else to default"""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are migrated through the primary
+        return db != replica_alias()
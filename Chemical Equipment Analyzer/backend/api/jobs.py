@@ -0,0 +1,409 @@
+"""
+Background analysis of uploads on a local process pool.
+
+No external broker is needed: jobs are persisted as UploadJob rows and the
+CPU-bound pandas work runs in worker processes owned by the Django process.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+import zipfile
+import zlib
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    """Configure Django inside a freshly spawned worker process"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'equipment_analyzer.settings')
+    import django
+    django.setup()
+
+
+def get_executor():
+    """Return the shared worker pool, creating it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'UPLOAD_WORKERS', None) or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def submit(fn, *args):
+    """Submit work to the pool, replacing it once if a worker died"""
+    global _executor
+    try:
+        return get_executor().submit(fn, *args)
+    except BrokenProcessPool:
+        with _executor_lock:
+            _executor = None
+        return get_executor().submit(fn, *args)
+
+
+def _spool_path():
+    spool_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+    os.makedirs(spool_dir, exist_ok=True)
+    return os.path.join(spool_dir, f'{uuid.uuid4().hex}.csv')
+
+
+def spool_upload(uploaded_file):
+    """Copy an uploaded file to the job spool directory and return its path
+
+    An upload Django already wrote to a temporary file is hard-linked
+    instead, when both are on the same filesystem; the link outlives the
+    request, which deletes the temporary file.
+    """
+    path = _spool_path()
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        try:
+            os.link(uploaded_file.temporary_file_path(), path)
+            return path
+        except OSError:
+            pass
+    with open(path, 'wb') as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+    return path
+
+
+class SpoolLimitExceeded(ValueError):
+    """A stream was longer than the bytes allowed for it"""
+
+
+def spool_stream(stream, max_bytes=None):
+    """Copy a readable stream to the spool directory, returning (path, sha256)
+
+    Raises SpoolLimitExceeded once more than max_bytes have been read. The
+    partially written file is removed whenever copying fails.
+    """
+    path = _spool_path()
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'wb') as out:
+            for chunk in iter(lambda: stream.read(1 << 20), b''):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise SpoolLimitExceeded(f'More than {max_bytes} bytes')
+                hasher.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        _remove_spooled(path)
+        raise
+    return path, hasher.hexdigest()
+
+
+def describe_error(exc):
+    """User-facing message for an analysis failure"""
+    from .analytics import CSVValidationError
+
+    if isinstance(exc, CSVValidationError):
+        return str(exc)
+    if isinstance(exc, pd.errors.EmptyDataError):
+        return 'CSV file is empty'
+    return f'Error processing CSV: {str(exc)}'
+
+
+def schedule_prerender(summary_ids):
+    """Render reports for new summaries in the background, if enabled"""
+    from .reports import prerender_enabled, prerender_reports
+
+    if not summary_ids or not prerender_enabled():
+        return
+    try:
+        submit(prerender_reports, list(summary_ids))
+    except Exception:
+        # Reports are rendered on first download instead
+        pass
+
+
+def enqueue_upload(user, uploaded_file, content_hash=''):
+    """Create a queued UploadJob for the file and hand it to the pool"""
+    from .models import UploadJob
+
+    job = UploadJob.objects.create(
+        user=user,
+        filename=uploaded_file.name,
+        upload_path=spool_upload(uploaded_file),
+        content_hash=content_hash,
+    )
+    try:
+        future = submit(run_upload_job, str(job.id))
+    except Exception as e:
+        job.status = UploadJob.STATUS_FAILED
+        job.error = f'Could not schedule analysis: {str(e)}'
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        _remove_spooled(job.upload_path)
+        return job
+    future.add_done_callback(
+        lambda done, job_id=job.id, path=job.upload_path: _job_future_done(job_id, path, done)
+    )
+    return job
+
+
+def _remove_spooled(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _fail_unfinished(job_filter, error):
+    """Mark matching queued or running jobs failed; returns how many"""
+    from .models import UploadJob
+
+    jobs = UploadJob.objects.filter(
+        job_filter, status__in=[UploadJob.STATUS_QUEUED, UploadJob.STATUS_RUNNING]
+    )
+    paths = list(jobs.values_list('upload_path', flat=True))
+    failed = jobs.update(status=UploadJob.STATUS_FAILED, error=error, updated_at=timezone.now())
+    for path in paths:
+        _remove_spooled(path)
+    return failed
+
+
+def _job_future_done(job_id, path, future):
+    """Fail a job whose worker died or raised outside its own error handling"""
+    if not future.cancelled() and future.exception() is None:
+        return
+    if future.cancelled():
+        error = 'Analysis was cancelled'
+    elif isinstance(future.exception(), BrokenProcessPool):
+        error = 'The analysis worker stopped unexpectedly'
+    else:
+        error = describe_error(future.exception())
+    try:
+        _fail_unfinished(Q(id=job_id), error)
+    finally:
+        # Runs on the pool's management thread, which Django does not clean up
+        connections.close_all()
+
+
+def fail_stale_jobs(job_filter=None, max_age=None):
+    """Fail jobs stuck in queued or running (e.g. after a server restart)
+
+    A job counts as stuck when it has not been updated for max_age seconds
+    (UPLOAD_JOB_TIMEOUT by default). job_filter (a Q) limits the jobs
+    checked. Returns the number of jobs failed.
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'UPLOAD_JOB_TIMEOUT', 3600)
+    stale = Q(updated_at__lt=timezone.now() - timedelta(seconds=max_age))
+    if job_filter is not None:
+        stale &= job_filter
+    return _fail_unfinished(stale, 'Analysis did not finish in time')
+
+
+def run_upload_job(job_id):
+    """Worker entry point: analyze the spooled file and store the summary"""
+    from .models import UploadJob
+    from .reports import prerender_enabled, prerender_reports
+    from .services import analyze_upload, save_summary
+
+    job = UploadJob.objects.select_related('user').get(id=job_id)
+    # A job failed by fail_stale_jobs while queued must stay failed
+    started = UploadJob.objects.filter(id=job.id, status=UploadJob.STATUS_QUEUED).update(
+        status=UploadJob.STATUS_RUNNING, updated_at=timezone.now()
+    )
+    if not started:
+        _remove_spooled(job.upload_path)
+        return UploadJob.objects.values_list('status', flat=True).get(id=job.id)
+
+    def restore():
+        with open(job.upload_path, 'rb') as f:
+            analyze_upload(f, job.content_hash)
+
+    try:
+        with open(job.upload_path, 'rb') as f:
+            result = analyze_upload(f, job.content_hash)
+        job.summary = save_summary(
+            job.user, job.filename, result, job.content_hash, restore=restore
+        )
+        job.status = UploadJob.STATUS_DONE
+        if prerender_enabled():
+            # Already off the request path, so render here
+            try:
+                prerender_reports([job.summary.id])
+            except Exception:
+                pass
+    except Exception as e:
+        job.status = UploadJob.STATUS_FAILED
+        job.error = describe_error(e)
+    finally:
+        try:
+            os.remove(job.upload_path)
+        except OSError:
+            pass
+
+    # Only a job still running records its outcome: one failed meanwhile by
+    # fail_stale_jobs was already reported to the client as failed
+    finished = UploadJob.objects.filter(id=job.id, status=UploadJob.STATUS_RUNNING).update(
+        status=job.status, summary=job.summary, error=job.error, updated_at=timezone.now()
+    )
+    if not finished:
+        if job.summary is not None:
+            job.summary.delete()
+        return UploadJob.STATUS_FAILED
+    return job.status
+
+
+def analyze_spooled(path, content_hash):
+    """Worker entry point for batch uploads: analyze and store one file"""
+    from .analytics import analyze_csv
+    from .storage import dataset_relpath
+
+    with open(path, 'rb') as f:
+        return analyze_csv(f, store_as=dataset_relpath(content_hash))
+
+
+def collect_batch_items(uploaded_files):
+    """Spool uploaded CSVs and the CSV members of ZIP archives
+
+    Returns a list of dicts with 'filename' and either 'path' and
+    'content_hash', or 'error' for inputs that cannot be analyzed.
+    """
+    from .upload_handlers import get_content_hash
+
+    max_files = getattr(settings, 'BATCH_MAX_FILES', 100)
+    max_bytes = getattr(settings, 'BATCH_MAX_UNCOMPRESSED_BYTES', 10 * 1024 ** 3)
+    items = []
+
+    try:
+        for uploaded_file in uploaded_files:
+            name = uploaded_file.name
+            if name.lower().endswith('.csv'):
+                items.append({
+                    'filename': name,
+                    'content_hash': get_content_hash(uploaded_file),
+                    'path': spool_upload(uploaded_file),
+                })
+            elif name.lower().endswith('.zip'):
+                items.extend(_collect_archive(uploaded_file, max_bytes))
+            else:
+                items.append({'filename': name, 'error': 'File must be a CSV or ZIP file'})
+    except BaseException:
+        discard_batch_items(items)
+        raise
+
+    if len(items) > max_files:
+        discard_batch_items(items)
+        raise ValueError(f'At most {max_files} files can be uploaded in one batch')
+    return items
+
+
+def _collect_archive(uploaded_file, max_bytes):
+    """Spool the CSV members of one ZIP archive (see collect_batch_items)"""
+    name = uploaded_file.name
+    try:
+        archive = zipfile.ZipFile(uploaded_file)
+    except zipfile.BadZipFile:
+        return [{'filename': name, 'error': 'Not a valid ZIP archive'}]
+
+    items = []
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.csv')
+            and not os.path.basename(info.filename).startswith('.')
+        ]
+        # Sizes in the archive header can be forged; also count what is read
+        if sum(info.file_size for info in members) > max_bytes:
+            return [{'filename': name, 'error': 'ZIP archive is too large'}]
+        remaining = max_bytes
+        try:
+            for info in members:
+                # Never trust archive paths; keep only the file name
+                filename = os.path.basename(info.filename)
+                try:
+                    with archive.open(info) as member:
+                        path, content_hash = spool_stream(member, max_bytes=remaining)
+                except SpoolLimitExceeded:
+                    discard_batch_items(items)
+                    return [{'filename': name, 'error': 'ZIP archive is too large'}]
+                except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError,
+                        NotImplementedError, OSError) as e:
+                    # Corrupt, truncated, encrypted or unsupported member
+                    items.append({'filename': filename, 'error': f'Could not extract file: {str(e)}'})
+                    continue
+                remaining -= os.path.getsize(path)
+                items.append({'filename': filename, 'content_hash': content_hash, 'path': path})
+        except BaseException:
+            discard_batch_items(items)
+            raise
+    return items
+
+
+def discard_batch_items(items):
+    """Remove spooled files that were not handed to a worker"""
+    for item in items:
+        if 'path' in item and os.path.exists(item['path']):
+            os.remove(item['path'])
+
+
+def process_batch(user, items):
+    """Analyze batch items in parallel and store all summaries together
+
+    Items whose content was analyzed before reuse the stored result; the
+    rest are spread across the worker pool. Spooled files are kept until
+    the summaries are saved and removed afterwards. Returns the items
+    annotated with either 'summary' or 'error', in their original order.
+    """
+    from .services import analyze_upload, get_cached_analysis, save_summaries
+
+    try:
+        futures = {}
+        for item in items:
+            if 'error' in item:
+                continue
+            cached = get_cached_analysis(item['content_hash'])
+            if cached is not None:
+                item['result'] = cached
+                continue
+            try:
+                futures[submit(analyze_spooled, item['path'], item['content_hash'])] = item
+            except Exception as e:
+                item['error'] = f'Could not schedule analysis: {str(e)}'
+
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                item['result'] = future.result()
+            except Exception as e:
+                item['error'] = describe_error(e)
+
+        analyzed = [item for item in items if 'result' in item]
+        paths = {item['content_hash']: item['path'] for item in analyzed}
+
+        def restore(content_hash):
+            with open(paths[content_hash], 'rb') as f:
+                analyze_upload(f, content_hash)
+
+        summaries = save_summaries(user, [
+            (item['filename'], item.pop('result'), item['content_hash'])
+            for item in analyzed
+        ], restore=restore)
+    finally:
+        discard_batch_items(items)
+
+    for item, summary in zip(analyzed, summaries):
+        if summary is None:
+            item['error'] = 'Not retained: removed by the history retention policy'
+        else:
+            item['summary'] = summary
+    return items
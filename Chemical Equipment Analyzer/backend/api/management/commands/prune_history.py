@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import fail_stale_jobs
+from api.retention import DEFAULT_BATCH_SIZE, age_cutoff, max_per_user, prune_all
+
+
+class Command(BaseCommand):
+    help = 'Delete dataset summaries outside the history retention policy and fail stuck upload jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Summaries deleted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = age_cutoff()
+        self.stdout.write(
+            f'Keeping {max_per_user()} summaries per user'
+            + (f', none uploaded before {cutoff:%Y-%m-%d %H:%M}' if cutoff else '')
+        )
+        total = 0
+        for user_id, deleted in prune_all(options['batch_size']):
+            self.stdout.write(f'User {user_id}: deleted {deleted}')
+            total += deleted
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} summaries'))
+        stale_jobs = fail_stale_jobs()
+        if stale_jobs:
+            self.stdout.write(f'Failed {stale_jobs} upload jobs that never finished')
@@ -0,0 +1,103 @@
+"""
+Response compression and streaming.
+
+CompressionMiddleware compresses responses with brotli when the client
+accepts it and the brotli package is installed, and with gzip otherwise.
+PDFs and ZIP archives are already compressed and pass through untouched.
+
+AsyncStreamingMiddleware keeps streamed responses (PDF and CSV downloads,
+ZIP exports) streaming under ASGI, where Django would otherwise read a sync
+iterator to the end into memory before sending the first byte.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+# Content types that do not shrink any further
+PRECOMPRESSED_TYPES = ('application/pdf', 'application/zip')
+
+# Bytes pulled from a sync iterator per thread hop under ASGI
+STREAM_BATCH_BYTES = 256 * 1024
+
+# Favour speed over ratio; these are per-request API payloads
+BROTLI_QUALITY = 5
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli or gzip compression of API responses"""
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith(PRECOMPRESSED_TYPES):
+            return response
+        if (
+            brotli is None
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < 200
+            or not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+def _take(iterator, size):
+    chunks, total = [], 0
+    for chunk in iterator:
+        chunks.append(chunk)
+        total += len(chunk)
+        if total >= size:
+            break
+    return b''.join(chunks)
+
+
+async def _iterate_in_thread(content):
+    iterator = iter(content)
+    take = sync_to_async(_take)
+    while True:
+        data = await take(iterator, STREAM_BATCH_BYTES)
+        if not data:
+            break
+        yield data
+
+
+class AsyncStreamingMiddleware:
+    """Serve sync streaming responses incrementally under ASGI"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        # WSGI servers iterate sync content themselves
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = _iterate_in_thread(response.streaming_content)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_content_hash_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetsummary',
+            name='dataset_path',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:10
+
+from django.db import migrations, models
+
+
+def backfill_sufficient_statistics(apps, schema_editor):
+    """Derive sufficient statistics for existing summaries
+
+    Summaries with extended statistics recover everything exactly; older
+    ones only know count and mean, so sum_sq/min/max are left unknown.
+    """
+    DatasetSummary = apps.get_model('api', 'DatasetSummary')
+    averages = {
+        'Flowrate': 'avg_flowrate',
+        'Pressure': 'avg_pressure',
+        'Temperature': 'avg_temperature',
+    }
+    for summary in DatasetSummary.objects.all().iterator():
+        overall = (summary.statistics or {}).get('overall', {})
+        sufficient = {}
+        for col, avg_field in averages.items():
+            stats = overall.get(col)
+            if stats:
+                count = stats['count']
+                total = stats['mean'] * count
+                sufficient[col] = {
+                    'count': count,
+                    'sum': total,
+                    'sum_sq': stats['std'] ** 2 * max(count - 1, 0) + stats['mean'] * total,
+                    'min': stats['min'],
+                    'max': stats['max'],
+                }
+            else:
+                count = summary.total_equipment_count
+                sufficient[col] = {
+                    'count': count,
+                    'sum': getattr(summary, avg_field) * count,
+                    'sum_sq': None,
+                    'min': None,
+                    'max': None,
+                }
+        summary.sufficient_statistics = sufficient
+        summary.save(update_fields=['sufficient_statistics'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_summary_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetsummary',
+            name='sufficient_statistics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_sufficient_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_sufficient_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasetsummary',
+            name='anomalies',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import json
+
+
+def copy_type_distributions(apps, schema_editor):
+    """Move the JSON type distributions into EquipmentTypeCount rows"""
+    DatasetSummary = apps.get_model('api', 'DatasetSummary')
+    EquipmentTypeCount = apps.get_model('api', 'EquipmentTypeCount')
+    rows = []
+    for summary in DatasetSummary.objects.only('id', 'equipment_type_distribution').iterator():
+        try:
+            distribution = json.loads(summary.equipment_type_distribution)
+        except (TypeError, ValueError):
+            distribution = {}
+        rows.extend(
+            EquipmentTypeCount(summary_id=summary.id, equipment_type=str(equipment_type), count=count)
+            for equipment_type, count in distribution.items()
+        )
+    EquipmentTypeCount.objects.bulk_create(rows, batch_size=1000)
+
+
+def restore_type_distributions(apps, schema_editor):
+    """Rebuild the JSON type distributions from EquipmentTypeCount rows"""
+    DatasetSummary = apps.get_model('api', 'DatasetSummary')
+    EquipmentTypeCount = apps.get_model('api', 'EquipmentTypeCount')
+    distributions = {}
+    for row in EquipmentTypeCount.objects.order_by('-count', 'equipment_type').iterator():
+        distributions.setdefault(row.summary_id, {})[row.equipment_type] = row.count
+    for summary in DatasetSummary.objects.only('id').iterator():
+        summary.equipment_type_distribution = json.dumps(distributions.get(summary.id, {}))
+        summary.save(update_fields=['equipment_type_distribution'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_summary_anomalies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentTypeCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_type', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['-count', 'equipment_type'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='datasetsummary',
+            index=models.Index(fields=['user', '-uploaded_at'], name='summary_user_recent_idx'),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypecount',
+            name='summary',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='type_counts', to='api.datasetsummary'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmenttypecount',
+            index=models.Index(fields=['equipment_type', 'summary'], name='type_count_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipmenttypecount',
+            constraint=models.UniqueConstraint(fields=('summary', 'equipment_type'), name='unique_type_count_per_summary'),
+        ),
+        migrations.RunPython(copy_type_distributions, restore_type_distributions),
+        # A default lets the column be re-added when migrating backwards
+        migrations.AlterField(
+            model_name='datasetsummary',
+            name='equipment_type_distribution',
+            field=models.TextField(default='{}'),
+        ),
+        migrations.RemoveField(
+            model_name='datasetsummary',
+            name='equipment_type_distribution',
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 import json
+import uuid
 
 
 class DatasetSummary(models.Model):
@@ -9,32 +10,150 @@ class DatasetSummary(models.Model):
     filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    # SHA-256 of the uploaded file, used to recognize repeat uploads
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    
     # Summary statistics
     total_equipment_count = models.IntegerField()
     avg_flowrate = models.FloatField()
     avg_pressure = models.FloatField()
     avg_temperature = models.FloatField()
     
-    # Equipment type distribution stored as JSON
-    equipment_type_distribution = models.TextField()  # JSON string
+    # Count/min/max/mean/std/percentiles per numeric column, overall and
+    # per equipment type: {'overall': {...}, 'by_type': {type: {...}}}
+    statistics = models.JSONField(default=dict, blank=True)
+    
+    # Mergeable per-column {count, sum, sum_sq, min, max}, so several
+    # datasets can be combined without touching their rows
+    sufficient_statistics = models.JSONField(default=dict, blank=True)
+    
+    # Outlier counts per column/test and per type (see api.anomalies);
+    # the flagged row indices are stored with the dataset
+    anomalies = models.JSONField(default=dict, blank=True)
     
     # Raw data summary (optional, for quick reference)
     raw_data_summary = models.TextField(null=True, blank=True)  # JSON string
     
+    # Cleaned rows in columnar form, relative to MEDIA_ROOT (see api.storage)
+    dataset_path = models.CharField(max_length=255, blank=True, default='')
+    
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Serves the per-user history, newest first
+            models.Index(fields=['user', '-uploaded_at'], name='summary_user_recent_idx'),
+        ]
     
     def get_type_distribution(self):
-        """Parse and return equipment type distribution as dict"""
-        try:
-            return json.loads(self.equipment_type_distribution)
-        except:
-            return {}
+        """Return equipment type distribution as dict, most common first
+        
+        Uses prefetched type_counts when available.
+        """
+        return {row.equipment_type: row.count for row in self.type_counts.all()}
+    
+    def type_count_rows(self, distribution):
+        """Unsaved EquipmentTypeCount rows for a {type: count} distribution"""
+        return [
+            EquipmentTypeCount(summary=self, equipment_type=equipment_type, count=count)
+            for equipment_type, count in distribution.items()
+        ]
     
     def set_type_distribution(self, distribution):
-        """Store equipment type distribution as JSON string"""
-        self.equipment_type_distribution = json.dumps(distribution)
+        """Replace the stored equipment type distribution (summary must be saved)"""
+        self.type_counts.all().delete()
+        EquipmentTypeCount.objects.bulk_create(self.type_count_rows(distribution))
+    
+    def open_dataset(self):
+        """Memory-map the stored cleaned rows, or None if not stored"""
+        from .storage import open_dataset
+        return open_dataset(self.dataset_path)
     
     def __str__(self):
         return f"{self.filename} - {self.uploaded_at}"
 
+
+class EquipmentTypeCount(models.Model):
+    """Number of rows of one equipment type in a dataset"""
+    summary = models.ForeignKey(
+        DatasetSummary, on_delete=models.CASCADE, related_name='type_counts'
+    )
+    equipment_type = models.CharField(max_length=255)
+    count = models.PositiveIntegerField()
+    
+    class Meta:
+        ordering = ['-count', 'equipment_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['summary', 'equipment_type'],
+                name='unique_type_count_per_summary',
+            ),
+        ]
+        indexes = [
+            # Finds the datasets containing a type without scanning summaries
+            models.Index(fields=['equipment_type', 'summary'], name='type_count_type_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.equipment_type}: {self.count}"
+
+
+class AnalysisResult(models.Model):
+    """Computed analytics indexed by the SHA-256 of the uploaded bytes"""
+    content_hash = models.CharField(max_length=64)
+    # Bumped whenever the analysis output changes shape
+    analysis_version = models.PositiveIntegerField()
+    result = models.TextField()  # JSON string
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_hash', 'analysis_version'],
+                name='unique_analysis_per_hash_version',
+            ),
+        ]
+    
+    def get_result(self):
+        """Parse and return the stored analysis result"""
+        return json.loads(self.result)
+    
+    def set_result(self, result):
+        """Store the analysis result as JSON string"""
+        self.result = json.dumps(result)
+    
+    def __str__(self):
+        return f"{self.content_hash[:12]} (v{self.analysis_version})"
+
+
+class UploadJob(models.Model):
+    """Track a CSV upload analyzed in the background worker pool"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    
+    # Spooled copy of the upload, removed once the job finishes
+    upload_path = models.CharField(max_length=500)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    
+    summary = models.ForeignKey(DatasetSummary, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.filename} - {self.status}"
@@ -0,0 +1,55 @@
+"""
+CPU-heavy request work on the shared worker pool.
+
+Analyzing an upload (pandas) and rendering a report (ReportLab) hold the GIL
+for most of their run; done in the request thread they slow down every other
+request served by the same process, under WSGI threads and ASGI alike. With
+OFFLOAD_CPU_WORK on, views hand that work to the process pool of api.jobs,
+so at most UPLOAD_WORKERS of these run at once and the request thread only
+waits for the result.
+"""
+import os
+
+from django.conf import settings
+
+from .jobs import spool_upload, submit
+
+
+def offload_enabled():
+    return getattr(settings, 'OFFLOAD_CPU_WORK', True)
+
+
+def analyze_spooled_upload(path, content_hash):
+    """Worker entry point: analyze an upload on disk and cache the result"""
+    from .services import analyze_upload
+
+    with open(path, 'rb') as f:
+        return analyze_upload(f, content_hash)
+
+
+def analyze_upload_offloaded(uploaded_file, content_hash):
+    """analyze_upload, run on the worker pool when offloading is enabled"""
+    from .services import analyze_upload
+
+    if not offload_enabled():
+        return analyze_upload(uploaded_file, content_hash)
+
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        # Already on disk, and kept until the request finishes
+        return submit(analyze_spooled_upload, uploaded_file.temporary_file_path(), content_hash).result()
+
+    path = spool_upload(uploaded_file)
+    try:
+        return submit(analyze_spooled_upload, path, content_hash).result()
+    finally:
+        os.remove(path)
+
+
+def open_report_offloaded(summary, variant='summary'):
+    """open_report, rendering a missing report on the worker pool"""
+    from .reports import open_report, render_report, report_path
+
+    if offload_enabled() and not os.path.exists(report_path(summary.id, variant)):
+        submit(render_report, summary.id, variant).result()
+    # Served from the cache now, unless evicted again in the meantime
+    return open_report(summary, variant)
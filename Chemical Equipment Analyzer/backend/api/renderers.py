@@ -0,0 +1,92 @@
+"""
+Compact representations of data-bearing responses.
+
+Row lists (``raw_data`` in upload responses, ``results`` in row and
+anomaly pages) are lists of dicts that repeat every column name in every
+row. The columnar formats send each such list as
+
+    {"columns": ["Equipment Name", "Type", ...], "data": [[names...], [types...], ...]}
+
+i.e. one value array per column. Clients pick a format with the Accept
+header or ``?format=``:
+
+    application/vnd.equipment.columnar+json   ?format=columnar
+    application/msgpack                       ?format=msgpack (needs msgpack)
+"""
+import datetime
+import decimal
+import uuid
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Keys holding row lists that are sent column-wise
+ROW_KEYS = ('raw_data', 'results')
+
+
+def _columnar_rows(rows):
+    columns = list(rows[0]) if rows else []
+    return {
+        'columns': columns,
+        'data': [[row.get(col) for row in rows] for col in columns],
+    }
+
+
+def to_columnar(data):
+    """Rewrite the row lists of a response payload column-wise"""
+    if isinstance(data, dict):
+        return {
+            key: _columnar_rows(value)
+            if key in ROW_KEYS and isinstance(value, list) and all(isinstance(row, dict) for row in value)
+            else to_columnar(value)
+            for key, value in data.items()
+        }
+    if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
+        # Lists of objects (history, batch results) keep their shape
+        return [to_columnar(item) for item in data]
+    return data
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """JSON with row lists sent column-wise"""
+    media_type = 'application/vnd.equipment.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(to_columnar(data), accepted_media_type, renderer_context)
+
+
+def _msgpack_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (ReturnDict, ReturnList)):
+        return value.copy()
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+class MessagePackRenderer(JSONRenderer):
+    """MessagePack with row lists sent column-wise"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(to_columnar(data), default=_msgpack_default, use_bin_type=True)
+
+
+# Renderers offered by endpoints that return datasets, summaries or rows
+DATA_RENDERERS = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    ColumnarJSONRenderer,
+    *([MessagePackRenderer] if msgpack is not None else []),
+]
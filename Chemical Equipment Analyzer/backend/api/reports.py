@@ -0,0 +1,506 @@
+"""
+PDF reports for dataset summaries and their on-disk cache.
+
+Reports come in three variants: 'summary' (aggregates and the type table),
+'full' (adds per-type statistics, charts and outlier counts) and 'rows'
+(full plus a listing of the stored rows, capped at REPORT_MAX_ROWS). Row
+listings are laid out one page at a time straight from the memory-mapped
+dataset, so only a page of rows is materialized at once.
+
+A summary never changes after upload, so each report is rendered once and
+kept under MEDIA_ROOT/reports, keyed by summary id, variant and
+REPORT_TEMPLATE_VERSION, then streamed from disk. The cache is bounded by
+REPORT_CACHE_MAX_BYTES; the least recently served reports are evicted first.
+With REPORT_PRERENDER enabled, reports are rendered in the background right
+after upload. Bulk exports render on the worker pool and stream the
+finished files into a ZIP archive as they complete.
+"""
+import glob
+import os
+import re
+import time
+import uuid
+import zipfile
+from concurrent.futures import as_completed
+from functools import lru_cache
+
+from django.conf import settings
+import numpy as np
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import (
+    Flowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+)
+
+from .analytics import NUMERIC_COLUMNS, QUANTILES
+
+# Bump whenever the report layout changes so cached files are re-rendered
+REPORT_TEMPLATE_VERSION = 2
+
+REPORT_DIR = 'reports'
+
+VARIANTS = ('summary', 'full', 'rows')
+
+# Types shown individually in charts; the rest are grouped as "Other"
+CHART_MAX_TYPES = 10
+
+ROW_HEIGHT = 12
+ROW_COLUMNS = ['#', 'Equipment Name', 'Type', *NUMERIC_COLUMNS]
+CHART_COLORS = [
+    colors.HexColor(value) for value in
+    ['#4e79a7', '#f28e2b', '#e15759', '#76b7b2', '#59a14f',
+     '#edc948', '#b07aa1', '#ff9da7', '#9c755f', '#bab0ac', '#888888']
+]
+
+
+@lru_cache(maxsize=None)
+def _styles():
+    """Paragraph and table styles, built once per process"""
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1a1a1a'),
+        spaceAfter=30,
+    )
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ])
+    row_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+        ('TOPPADDING', (0, 0), (-1, -1), 1),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f3f3')]),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.black),
+    ])
+    return styles, title_style, table_style, row_style
+
+
+def _top_types(distribution):
+    """(type, count) pairs for charts, folding the long tail into Other"""
+    items = list(distribution.items())
+    if len(items) <= CHART_MAX_TYPES:
+        return items
+    head = items[:CHART_MAX_TYPES - 1]
+    return head + [('Other', sum(count for _, count in items[CHART_MAX_TYPES - 1:]))]
+
+
+def _distribution_chart(distribution):
+    """Pie chart of the equipment type distribution"""
+    items = _top_types(distribution)
+    drawing = Drawing(6.5*inch, 2.6*inch)
+    pie = Pie()
+    pie.x, pie.y = 20, 15
+    pie.width = pie.height = 2.2*inch
+    pie.data = [count for _, count in items]
+    pie.slices.strokeColor = colors.white
+    for i in range(len(items)):
+        pie.slices[i].fillColor = CHART_COLORS[i % len(CHART_COLORS)]
+    drawing.add(pie)
+
+    legend = Legend()
+    legend.x, legend.y = 2.8*inch, 2.3*inch
+    legend.fontSize = 8
+    legend.alignment = 'right'
+    legend.colorNamePairs = [
+        (CHART_COLORS[i % len(CHART_COLORS)], f'{name} ({count})')
+        for i, (name, count) in enumerate(items)
+    ]
+    drawing.add(legend)
+    return drawing
+
+
+def _averages_chart(by_type, distribution):
+    """Grouped bar chart of the per-type averages of every numeric column"""
+    names = [name for name, _ in _top_types(distribution) if name in by_type]
+    drawing = Drawing(6.5*inch, 2.8*inch)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 40, 40
+    chart.width, chart.height = 4.6*inch, 2.2*inch
+    chart.data = [
+        [by_type[name][col]['mean'] or 0 for name in names]
+        for col in NUMERIC_COLUMNS
+    ]
+    chart.categoryAxis.categoryNames = [name[:12] for name in names]
+    chart.categoryAxis.labels.fontSize = 7
+    chart.categoryAxis.labels.angle = 30
+    chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.valueAxis.labels.fontSize = 7
+    chart.barSpacing = 1
+    for i in range(len(NUMERIC_COLUMNS)):
+        chart.bars[i].fillColor = CHART_COLORS[i]
+    drawing.add(chart)
+
+    legend = Legend()
+    legend.x, legend.y = 5.3*inch, 2.4*inch
+    legend.fontSize = 8
+    legend.colorNamePairs = [
+        (CHART_COLORS[i], f'Avg {col}') for i, col in enumerate(NUMERIC_COLUMNS)
+    ]
+    drawing.add(legend)
+    return drawing
+
+
+def _format_stat(value):
+    return '-' if value is None else f'{value:.2f}'
+
+
+def _type_statistics_table(col, by_type, table_style):
+    """Per-type statistics of one numeric column"""
+    percentiles = [f'p{int(q * 100)}' for q in QUANTILES]
+    data = [['Type', 'Count', 'Mean', 'Std', 'Min', *percentiles, 'Max']]
+    for name, columns in by_type.items():
+        stats = columns[col]
+        data.append([
+            str(name), str(stats['count']),
+            *[_format_stat(stats[key]) for key in ['mean', 'std', 'min', *percentiles, 'max']],
+        ])
+    table = Table(data, repeatRows=1)
+    table.setStyle(table_style)
+    return table
+
+
+class RowListing(Flowable):
+    """Stored rows laid out as one page-sized Table at a time
+
+    Platypus splits the listing whenever it does not fit the frame; each
+    split materializes only the rows that fit on the current page.
+    """
+
+    def __init__(self, dataset, start, stop, style):
+        super().__init__()
+        self.dataset = dataset
+        self.start = start
+        self.stop = stop
+        self.style = style
+
+    def wrap(self, availWidth, availHeight):
+        # Never fits as a whole, so the frame always asks for a split
+        return availWidth, availHeight + 1
+
+    def split(self, availWidth, availHeight):
+        fit = int(availHeight // ROW_HEIGHT) - 2
+        if fit <= 0:
+            return []
+        stop = min(self.start + fit, self.stop)
+        indices = np.arange(self.start, stop, dtype=np.int64)
+        data = [ROW_COLUMNS] + [
+            [str(index + 1), record['Equipment Name'][:40], str(record['Type'] or '')[:20],
+             *[f'{record[col]:.3f}' for col in NUMERIC_COLUMNS]]
+            for index, record in zip(indices.tolist(), self.dataset.records(indices))
+        ]
+        table = Table(data, rowHeights=ROW_HEIGHT)
+        table.setStyle(self.style)
+        if stop >= self.stop:
+            return [table]
+        return [table, RowListing(self.dataset, stop, self.stop, self.style)]
+
+    def draw(self):
+        pass
+
+
+def build_report(summary, out, variant='summary'):
+    """Render a report variant for a summary into a path or binary file object"""
+    styles, title_style, table_style, row_style = _styles()
+    doc = SimpleDocTemplate(out, pagesize=letter)
+    story = []
+
+    # Title
+    story.append(Paragraph("Chemical Equipment Analysis Report", title_style))
+    story.append(Spacer(1, 0.2*inch))
+
+    # File info
+    story.append(Paragraph(f"<b>File:</b> {summary.filename}", styles['Normal']))
+    story.append(Paragraph(f"<b>Uploaded:</b> {summary.uploaded_at.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
+    story.append(Spacer(1, 0.3*inch))
+
+    # Summary Statistics
+    story.append(Paragraph("<b>Summary Statistics</b>", styles['Heading2']))
+    story.append(Spacer(1, 0.1*inch))
+
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Equipment Count', str(summary.total_equipment_count)],
+        ['Average Flowrate', f"{summary.avg_flowrate:.2f}"],
+        ['Average Pressure', f"{summary.avg_pressure:.2f}"],
+        ['Average Temperature', f"{summary.avg_temperature:.2f}"],
+    ]
+
+    summary_table = Table(summary_data)
+    summary_table.setStyle(table_style)
+
+    story.append(summary_table)
+    story.append(Spacer(1, 0.3*inch))
+
+    # Equipment Type Distribution
+    story.append(Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2']))
+    story.append(Spacer(1, 0.1*inch))
+
+    type_dist = summary.get_type_distribution()
+    if type_dist:
+        dist_data = [['Equipment Type', 'Count']]
+        for eq_type, count in type_dist.items():
+            dist_data.append([str(eq_type), str(count)])
+
+        dist_table = Table(dist_data)
+        dist_table.setStyle(table_style)
+
+        story.append(dist_table)
+
+    if variant in ('full', 'rows'):
+        story.extend(_full_sections(summary, type_dist, styles, table_style))
+    if variant == 'rows':
+        story.extend(_row_sections(summary, styles, row_style))
+
+    doc.build(story)
+
+
+def _full_sections(summary, type_dist, styles, table_style):
+    """Charts, per-type statistics and outlier counts"""
+    story = []
+    by_type = (summary.statistics or {}).get('by_type', {})
+
+    if type_dist:
+        story.append(Spacer(1, 0.3*inch))
+        story.append(Paragraph("<b>Distribution Chart</b>", styles['Heading2']))
+        story.append(_distribution_chart(type_dist))
+    if by_type:
+        story.append(Paragraph("<b>Averages by Type</b>", styles['Heading2']))
+        story.append(_averages_chart(by_type, type_dist))
+
+        story.append(PageBreak())
+        story.append(Paragraph("<b>Statistics by Type</b>", styles['Heading2']))
+        for col in NUMERIC_COLUMNS:
+            story.append(Paragraph(f"<b>{col}</b>", styles['Heading3']))
+            story.append(_type_statistics_table(col, by_type, table_style))
+            story.append(Spacer(1, 0.2*inch))
+
+    anomalies = summary.anomalies or {}
+    if anomalies.get('by_column'):
+        story.append(Paragraph("<b>Outliers</b>", styles['Heading2']))
+        story.append(Paragraph(
+            f"{anomalies['total']} rows flagged (z-score &gt; {anomalies['z_threshold']}, "
+            f"IQR multiplier {anomalies['iqr_multiplier']})", styles['Normal']
+        ))
+        story.append(Spacer(1, 0.1*inch))
+        data = [['Column', 'Z-score', 'IQR']] + [
+            [col, str(counts['zscore']), str(counts['iqr'])]
+            for col, counts in anomalies['by_column'].items()
+        ]
+        table = Table(data)
+        table.setStyle(table_style)
+        story.append(table)
+    return story
+
+
+def _row_sections(summary, styles, row_style):
+    """Listing of the stored rows, up to REPORT_MAX_ROWS"""
+    dataset = summary.open_dataset()
+    if dataset is None:
+        return [Paragraph("Stored rows are not available for this dataset.", styles['Normal'])]
+
+    limit = min(len(dataset), getattr(settings, 'REPORT_MAX_ROWS', 100000))
+    story = [PageBreak(), Paragraph("<b>Equipment Rows</b>", styles['Heading2'])]
+    if limit < len(dataset):
+        story.append(Paragraph(f"First {limit} of {len(dataset)} rows.", styles['Normal']))
+    if limit:
+        story.append(RowListing(dataset, 0, limit, row_style))
+    return story
+
+
+def _report_dir():
+    return os.path.join(settings.MEDIA_ROOT, REPORT_DIR)
+
+
+def report_path(summary_id, variant='summary'):
+    """Cache location of a summary's report for the current template"""
+    return os.path.join(
+        _report_dir(), f'{summary_id}-{variant}-v{REPORT_TEMPLATE_VERSION}.pdf'
+    )
+
+
+def get_report(summary, variant='summary'):
+    """Path of the rendered report for a summary, rendering it if needed"""
+    path = report_path(summary.id, variant)
+    try:
+        # Refresh the timestamp eviction orders by
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(_report_dir(), exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        build_report(summary, tmp_path, variant)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    evict_reports(keep=path)
+    return path
+
+
+def open_report(summary, variant='summary'):
+    """Open the rendered report of a summary for reading"""
+    try:
+        return open(get_report(summary, variant), 'rb')
+    except FileNotFoundError:
+        # Evicted by a concurrent render between lookup and open
+        return open(get_report(summary, variant), 'rb')
+
+
+def evict_reports(keep=None):
+    """Delete least recently used reports until the cache fits its size limit"""
+    max_bytes = getattr(settings, 'REPORT_CACHE_MAX_BYTES', 256 * 1024 ** 2)
+    entries = []
+    for path in glob.glob(os.path.join(_report_dir(), '*.pdf')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def delete_reports(summary_id):
+    """Remove every cached report of a summary"""
+    for path in glob.glob(os.path.join(_report_dir(), f'{summary_id}-*.pdf')):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def prerender_enabled():
+    """Whether reports are rendered right after upload"""
+    return getattr(settings, 'REPORT_PRERENDER', False)
+
+
+def prerender_reports(summary_ids):
+    """Worker entry point: render and cache the reports of new summaries"""
+    from .models import DatasetSummary
+
+    summaries = DatasetSummary.objects.filter(id__in=summary_ids).prefetch_related('type_counts')
+    for summary in summaries:
+        for variant in ('summary', 'full'):
+            get_report(summary, variant)
+
+
+def render_report(summary_id, variant='summary'):
+    """Worker entry point: render one report into the cache and return its path"""
+    from .models import DatasetSummary
+
+    summary = DatasetSummary.objects.prefetch_related('type_counts').get(id=summary_id)
+    return get_report(summary, variant)
+
+
+class _ZipStream:
+    """Write-only file object that hands written bytes to a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _archive_name(summary):
+    stem = re.sub(r'[^\w.-]+', '_', os.path.splitext(summary['filename'])[0]) or 'dataset'
+    return f"report_{summary['id']}_{stem}.pdf"
+
+
+def _open_rendered(path, summary_id, variant):
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        # Evicted since the worker rendered it; render again here
+        return open(render_report(summary_id, variant), 'rb')
+
+
+def stream_report_archive(summaries, variant='summary'):
+    """Yield a ZIP of the reports of summaries ({'id', 'filename'} dicts)
+
+    Reports not yet cached are rendered in parallel on the worker pool; each
+    is added to the archive as soon as it is ready. Reports that fail are
+    listed in errors.txt instead.
+    """
+    from .jobs import submit
+
+    futures = {}
+    ready = []
+    for summary in summaries:
+        path = report_path(summary['id'], variant)
+        if os.path.exists(path):
+            ready.append((summary, path))
+        else:
+            futures[submit(render_report, summary['id'], variant)] = summary
+
+    def completed():
+        yield from ready
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+
+    stream = _ZipStream()
+    errors = []
+    try:
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for summary, outcome in completed():
+                if isinstance(outcome, Exception):
+                    errors.append(f"{summary['id']} {summary['filename']}: {outcome}")
+                    continue
+                info = zipfile.ZipInfo(_archive_name(summary), time.localtime()[:6])
+                with _open_rendered(outcome, summary['id'], variant) as report, \
+                        archive.open(info, 'w', force_zip64=True) as entry:
+                    for block in iter(lambda: report.read(1 << 16), b''):
+                        entry.write(block)
+                        yield stream.drain()
+            if errors:
+                archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+        yield stream.drain()
+    finally:
+        # The client went away; drop renders that have not started
+        for future in futures:
+            future.cancel()
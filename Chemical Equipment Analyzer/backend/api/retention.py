@@ -0,0 +1,98 @@
+"""
+Retention of per-user dataset history.
+
+Each user keeps at most HISTORY_MAX_PER_USER summaries and, when
+HISTORY_MAX_AGE_DAYS is set, none older than that. Uploads prune the
+uploader's history in the same transaction as the insert (unless
+HISTORY_PRUNE_ON_UPLOAD is off); ``manage.py prune_history`` applies the
+policy to every user in batches. Stored artifacts of deleted summaries are
+removed by the signal handlers in api.signals once the deletion commits.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DatasetSummary
+
+# Summaries deleted per statement when pruning in bulk
+DEFAULT_BATCH_SIZE = 500
+
+
+def max_per_user():
+    """Number of summaries each user keeps"""
+    return getattr(settings, 'HISTORY_MAX_PER_USER', 5)
+
+
+def age_cutoff():
+    """Oldest upload time kept, or None if age is unlimited"""
+    days = getattr(settings, 'HISTORY_MAX_AGE_DAYS', None)
+    if not days:
+        return None
+    return timezone.now() - timedelta(days=days)
+
+
+def prune_on_upload():
+    """Whether uploads prune the uploader's history themselves"""
+    return getattr(settings, 'HISTORY_PRUNE_ON_UPLOAD', True)
+
+
+def _stale_filter(user_id, keep, cutoff):
+    """Q matching a user's summaries outside the retention policy"""
+    # Newest first; one indexed range scan on (user, -uploaded_at)
+    overflow = list(
+        DatasetSummary.objects.filter(user_id=user_id)
+        .order_by('-uploaded_at', '-id')
+        .values_list('id', flat=True)[keep:]
+    )
+    stale = Q(id__in=overflow)
+    if cutoff is not None:
+        stale |= Q(user_id=user_id, uploaded_at__lt=cutoff)
+    return stale
+
+
+def prune_user_history(user, keep=None):
+    """Apply the retention policy to one user; returns the number deleted
+
+    Call inside the transaction that inserted new summaries so the insert
+    and the pruning commit (or fail) together. The user row is locked so
+    concurrent uploads by the same user prune one after another.
+    """
+    keep = max_per_user() if keep is None else keep
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk'))
+        stale = _stale_filter(user.pk, keep, age_cutoff())
+        _, deleted = DatasetSummary.objects.filter(stale).delete()
+    # delete() also reports cascaded rows; count summaries only
+    return deleted.get(DatasetSummary._meta.label, 0)
+
+
+def prune_all(batch_size=DEFAULT_BATCH_SIZE):
+    """Apply the retention policy to every user in bounded batches
+
+    Yields (user_id, deleted) for each user that lost summaries.
+    """
+    keep = max_per_user()
+    cutoff = age_cutoff()
+    user_ids = (
+        DatasetSummary.objects.filter(user__isnull=False)
+        .values_list('user_id', flat=True).distinct().order_by('user_id')
+    )
+    for user_id in list(user_ids):
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                stale_ids = list(
+                    DatasetSummary.objects.filter(_stale_filter(user_id, keep, cutoff))
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if stale_ids:
+                    DatasetSummary.objects.filter(id__in=stale_ids).delete()
+            deleted += len(stale_ids)
+            if len(stale_ids) < batch_size:
+                break
+        if deleted:
+            yield user_id, deleted
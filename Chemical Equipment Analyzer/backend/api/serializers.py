@@ -1,22 +1,40 @@
 from rest_framework import serializers
-from .models import DatasetSummary
+from .models import DatasetSummary, UploadJob
 from django.contrib.auth.models import User
 
 
 class DatasetSummarySerializer(serializers.ModelSerializer):
     equipment_type_distribution = serializers.SerializerMethodField()
+    has_dataset = serializers.SerializerMethodField()
     
     class Meta:
         model = DatasetSummary
         fields = [
             'id', 'filename', 'uploaded_at', 'total_equipment_count',
             'avg_flowrate', 'avg_pressure', 'avg_temperature',
-            'equipment_type_distribution'
+            'equipment_type_distribution', 'statistics', 'anomalies',
+            'has_dataset'
         ]
         read_only_fields = ['id', 'uploaded_at']
     
     def get_equipment_type_distribution(self, obj):
         return obj.get_type_distribution()
+    
+    def get_has_dataset(self, obj):
+        return bool(obj.dataset_path)
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    summary_id = serializers.IntegerField(allow_null=True, read_only=True)
+    
+    class Meta:
+        model = UploadJob
+        fields = [
+            'job_id', 'filename', 'status', 'summary_id', 'error',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
 
 
 class UserSerializer(serializers.ModelSerializer):
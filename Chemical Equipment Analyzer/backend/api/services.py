@@ -0,0 +1,130 @@
+"""
+Persistence helpers shared by the request views and background workers.
+"""
+from functools import partial
+
+from django.db import IntegrityError, transaction
+
+from .analytics import ANALYSIS_VERSION, analyze_csv
+from .cache import invalidate_user_on_commit
+from .models import AnalysisResult, DatasetSummary, EquipmentTypeCount
+from .retention import max_per_user, prune_on_upload, prune_user_history
+from .storage import dataset_exists, dataset_lock, dataset_relpath
+
+
+def get_cached_analysis(content_hash):
+    """Return the stored analysis for identical content, or None"""
+    if not content_hash or not dataset_exists(dataset_relpath(content_hash)):
+        return None
+    cached = AnalysisResult.objects.filter(
+        content_hash=content_hash, analysis_version=ANALYSIS_VERSION
+    ).first()
+    return cached.get_result() if cached else None
+
+
+def cache_analysis(content_hash, result):
+    """Index an analysis result by content hash for later repeat uploads"""
+    if not content_hash:
+        return
+    cached = AnalysisResult(content_hash=content_hash, analysis_version=ANALYSIS_VERSION)
+    cached.set_result(result)
+    try:
+        with transaction.atomic():
+            cached.save()
+    except IntegrityError:
+        # A concurrent upload of the same file stored it first
+        pass
+
+
+def analyze_upload(file, content_hash):
+    """Analyze an upload, storing its cleaned rows and caching the result"""
+    store_as = dataset_relpath(content_hash) if content_hash else None
+    file.seek(0)
+    result = analyze_csv(file, store_as=store_as)
+    cache_analysis(content_hash, result)
+    return result
+
+
+def _build_summary(user, filename, result, content_hash=''):
+    """Unsaved DatasetSummary for an analysis result"""
+    summary = DatasetSummary(
+        user=user,
+        filename=filename,
+        content_hash=content_hash,
+        dataset_path=dataset_relpath(content_hash) if content_hash else '',
+        total_equipment_count=result['total_equipment_count'],
+        avg_flowrate=result['avg_flowrate'],
+        avg_pressure=result['avg_pressure'],
+        avg_temperature=result['avg_temperature'],
+        statistics=result['statistics'],
+        sufficient_statistics=result['sufficient_statistics'],
+        anomalies=result.get('anomalies', {}),
+    )
+    return summary
+
+
+def _ensure_dataset(content_hash, restore):
+    """Re-store a dataset deleted since it was analyzed (call under dataset_lock)
+
+    The last summary sharing identical content may have been deleted, and
+    its dataset with it, between the analysis and this save. restore() runs
+    under the lock, so it must store in this thread, not on the worker pool
+    (whose DatasetWriter would wait for the same lock).
+    """
+    if content_hash and restore is not None and not dataset_exists(dataset_relpath(content_hash)):
+        restore()
+
+
+def save_summary(user, filename, result, content_hash='', restore=None):
+    """Store the analysis result for a user and apply history retention
+
+    restore(), if given, stores the dataset again when it was deleted in the
+    meantime (by re-analyzing the upload).
+    """
+    with dataset_lock(content_hash):
+        _ensure_dataset(content_hash, restore)
+        with transaction.atomic():
+            summary = _build_summary(user, filename, result, content_hash)
+            summary.save()
+            summary.set_type_distribution(result['equipment_type_distribution'])
+            if prune_on_upload():
+                prune_user_history(user)
+            invalidate_user_on_commit(user.pk)
+    return summary
+
+
+def save_summaries(user, entries, restore=None):
+    """Store several (filename, result, content_hash) entries in one transaction
+
+    The batch's own summaries are exempt from the count limit of the prune
+    that follows the insert. restore(content_hash), if given, stores a
+    dataset again when it was deleted in the meantime. Returns one summary
+    per entry, or None where the summary did not survive retention (e.g. a
+    concurrent upload pruned it).
+    """
+    content_hashes = [content_hash for _, _, content_hash in entries]
+    with dataset_lock(*content_hashes):
+        if restore is not None:
+            for content_hash in set(content_hashes):
+                _ensure_dataset(content_hash, partial(restore, content_hash))
+        with transaction.atomic():
+            for filename, result, content_hash in entries:
+                cache_analysis(content_hash, result)
+            summaries = DatasetSummary.objects.bulk_create([
+                _build_summary(user, filename, result, content_hash)
+                for filename, result, content_hash in entries
+            ])
+            EquipmentTypeCount.objects.bulk_create([
+                row
+                for summary, (_, result, _) in zip(summaries, entries)
+                for row in summary.type_count_rows(result['equipment_type_distribution'])
+            ])
+            if prune_on_upload():
+                # The batch is the newest history: keep all of it
+                prune_user_history(user, keep=max(max_per_user(), len(summaries)))
+            invalidate_user_on_commit(user.pk)
+            kept = set(
+                DatasetSummary.objects.filter(id__in=[summary.id for summary in summaries])
+                .values_list('id', flat=True)
+            )
+    return [summary if summary.id in kept else None for summary in summaries]
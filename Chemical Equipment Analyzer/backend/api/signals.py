@@ -0,0 +1,48 @@
+"""
+Cleanup when summaries are deleted (cached responses, rendered reports and
+stored datasets) and when auth tokens are revoked.
+
+Datasets are shared by content hash, so a dataset directory is only removed
+once no remaining summary points at it. Cleanup runs after the deleting
+transaction commits, so a rolled-back deletion keeps its files.
+"""
+import os
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token
+from .cache import invalidate_user_on_commit
+from .models import AnalysisResult, DatasetSummary
+from .reports import delete_reports
+from .storage import dataset_lock, delete_dataset
+
+
+def release_dataset(relpath, content_hash):
+    """Delete a stored dataset and its cached analysis unless still in use"""
+    if not relpath:
+        return
+    # Under the lock that new summaries for this content are committed under
+    with dataset_lock(os.path.basename(relpath)):
+        if DatasetSummary.objects.filter(dataset_path=relpath).exists():
+            return
+        delete_dataset(relpath)
+        if content_hash:
+            AnalysisResult.objects.filter(content_hash=content_hash).delete()
+
+
+@receiver(post_delete, sender=DatasetSummary)
+def cleanup_summary_artifacts(sender, instance, **kwargs):
+    invalidate_user_on_commit(instance.user_id)
+    transaction.on_commit(partial(delete_reports, instance.pk))
+    transaction.on_commit(
+        partial(release_dataset, instance.dataset_path, instance.content_hash)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_token(instance.key)
@@ -0,0 +1,405 @@
+"""
+Columnar on-disk storage for cleaned datasets.
+
+Each dataset is a directory under MEDIA_ROOT/datasets holding one flat binary
+file per column plus a small meta.json, so readers can memory-map columns
+instead of re-parsing the original upload:
+
+    flowrate.f8, pressure.f8, temperature.f8   float64 values
+    type_codes.i4                              int32 index into meta['types']
+    name_offsets.i8, name_data.bin             UTF-8 equipment names
+    sort_<column>.i8                           row order sorted by that column
+    anomaly_rows.i8, anomaly_flags.u1          flagged rows (see api.anomalies)
+
+Datasets are keyed by the upload's content hash, so identical uploads share
+one copy. Writers build into a temporary directory and rename it into place
+when complete, so readers never see a partial dataset. dataset_lock()
+serializes referencing a shared dataset with deleting it.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .analytics import ANALYSIS_VERSION, NUMERIC_COLUMNS
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover the threads of one process
+    fcntl = None
+
+DATASET_DIR = 'datasets'
+FORMAT_VERSION = 1
+
+_NUMERIC_FILES = {col: f'{col.lower()}.f8' for col in NUMERIC_COLUMNS}
+_TYPE_CODES_FILE = 'type_codes.i4'
+_NAME_OFFSETS_FILE = 'name_offsets.i8'
+_NAME_DATA_FILE = 'name_data.bin'
+_META_FILE = 'meta.json'
+
+# Columns a dataset can be sorted by, keyed by their lowercase API name
+SORT_COLUMNS = {col.lower(): col for col in ['Equipment Name', 'Type', *NUMERIC_COLUMNS]}
+
+# Sort orders built while storing a dataset (cheap, fixed-size keys); the
+# others are built on the first request that sorts by them
+PRECOMPUTED_SORTS = ['Type', *NUMERIC_COLUMNS]
+
+
+def dataset_relpath(content_hash):
+    """Path of the stored dataset for a content hash, relative to MEDIA_ROOT"""
+    return os.path.join(DATASET_DIR, content_hash)
+
+
+def dataset_abspath(relpath):
+    """Absolute location of a stored dataset"""
+    return os.path.join(settings.MEDIA_ROOT, relpath)
+
+
+def _sort_file(column):
+    return f"sort_{column.lower().replace(' ', '_')}.i8"
+
+
+# Lock files are shared by hashes with the same first two hex digits
+_LOCK_DIR = '.locks'
+_thread_locks = {}
+_held = threading.local()
+
+
+@contextmanager
+def _stripe_lock(stripe):
+    held = getattr(_held, 'stripes', None)
+    if held is None:
+        held = _held.stripes = set()
+    if stripe in held:
+        # Already held by this thread (e.g. a cleanup running on commit)
+        yield
+        return
+    lock_dir = os.path.join(settings.MEDIA_ROOT, DATASET_DIR, _LOCK_DIR)
+    os.makedirs(lock_dir, exist_ok=True)
+    with _thread_locks.setdefault(stripe, threading.Lock()):
+        with open(os.path.join(lock_dir, stripe), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            held.add(stripe)
+            try:
+                yield
+            finally:
+                held.discard(stripe)
+
+
+@contextmanager
+def dataset_lock(*content_hashes):
+    """Hold the cross-process lock of the datasets of these content hashes
+
+    Checking that a dataset exists and committing a summary that refers to
+    it must happen under this lock, as must deciding a dataset is unused
+    and deleting it; otherwise a summary can end up pointing at a deleted
+    dataset. Empty hashes are ignored.
+    """
+    with ExitStack() as stack:
+        # Always in the same order, so two holders cannot deadlock
+        for stripe in sorted({h[:2] for h in content_hashes if h}):
+            stack.enter_context(_stripe_lock(stripe))
+        yield
+
+
+def dataset_exists(relpath):
+    """Whether a complete dataset is stored at relpath"""
+    return bool(relpath) and os.path.exists(
+        os.path.join(dataset_abspath(relpath), _META_FILE)
+    )
+
+
+def _is_current(path):
+    """Whether a complete dataset written by this analysis version is at path"""
+    try:
+        with open(os.path.join(path, _META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get('format') == FORMAT_VERSION and meta.get('analysis_version') == ANALYSIS_VERSION
+
+
+def delete_dataset(relpath):
+    """Remove a stored dataset directory"""
+    if relpath:
+        shutil.rmtree(dataset_abspath(relpath), ignore_errors=True)
+
+
+class DatasetWriter:
+    """Append cleaned chunks to a new columnar dataset"""
+
+    def __init__(self, relpath):
+        self.relpath = relpath
+        self.final_dir = dataset_abspath(relpath)
+        self.tmp_dir = os.path.join(
+            os.path.dirname(self.final_dir), f'.tmp-{uuid.uuid4().hex}'
+        )
+        os.makedirs(self.tmp_dir)
+
+        self.rows = 0
+        self.name_bytes = 0
+        self.type_index = {}
+        self._files = {
+            name: open(os.path.join(self.tmp_dir, name), 'wb')
+            for name in [*_NUMERIC_FILES.values(), _TYPE_CODES_FILE,
+                         _NAME_OFFSETS_FILE, _NAME_DATA_FILE]
+        }
+        np.zeros(1, dtype=np.int64).tofile(self._files[_NAME_OFFSETS_FILE])
+
+    def _type_code(self, value):
+        return self.type_index.setdefault(str(value), len(self.type_index))
+
+    def append(self, chunk):
+        """Write one cleaned chunk (standard column names)"""
+        if len(chunk) == 0:
+            return
+
+        for col, filename in _NUMERIC_FILES.items():
+            chunk[col].to_numpy(dtype=np.float64).tofile(self._files[filename])
+
+        # Translate per-chunk factor codes into dataset-wide type codes
+        codes, uniques = pd.factorize(chunk['Type'])
+        lookup = np.array([self._type_code(u) for u in uniques] + [-1], dtype=np.int32)
+        lookup[codes].tofile(self._files[_TYPE_CODES_FILE])
+
+        encoded = [name.encode('utf-8') for name in chunk['Equipment Name'].fillna('').astype(str)]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        (self.name_bytes + np.cumsum(lengths)).tofile(self._files[_NAME_OFFSETS_FILE])
+        self._files[_NAME_DATA_FILE].write(b''.join(encoded))
+        self.name_bytes += int(lengths.sum())
+
+        self.rows += len(chunk)
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+
+    def commit(self, finalize=None):
+        """Finish the dataset and move it into place
+
+        finalize, if given, is called with the complete StoredDataset before
+        it is published (to add derived files) and its return value is
+        returned.
+        """
+        self._close_files()
+        meta = {
+            'format': FORMAT_VERSION,
+            # Derived files (sort orders, anomaly flags) depend on the analysis
+            'analysis_version': ANALYSIS_VERSION,
+            'rows': self.rows,
+            'types': sorted(self.type_index, key=self.type_index.get),
+        }
+        with open(os.path.join(self.tmp_dir, _META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        # Precompute sort orders so sorted pages can be sliced directly
+        dataset = StoredDataset(os.path.relpath(self.tmp_dir, settings.MEDIA_ROOT))
+        for col in PRECOMPUTED_SORTS:
+            dataset.sort_index(col)
+        outcome = finalize(dataset) if finalize is not None else None
+        del dataset
+
+        with dataset_lock(os.path.basename(self.final_dir)):
+            if _is_current(self.final_dir):
+                # Identical content was stored concurrently; keep that copy
+                shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            else:
+                self._replace_final()
+        return outcome
+
+    def _replace_final(self):
+        """Move the new dataset into place, replacing a stale or partial copy"""
+        old_dir = None
+        if os.path.exists(self.final_dir):
+            # Open memory maps of the old copy stay valid after it is removed
+            old_dir = os.path.join(os.path.dirname(self.final_dir), f'.old-{uuid.uuid4().hex}')
+            try:
+                os.rename(self.final_dir, old_dir)
+            except OSError:
+                # Files of the old copy are in use (Windows); keep serving it
+                shutil.rmtree(self.tmp_dir, ignore_errors=True)
+                return
+        os.rename(self.tmp_dir, self.final_dir)
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+    def abort(self):
+        """Discard everything written so far"""
+        self._close_files()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class StoredDataset:
+    """Read-only, memory-mapped view of a stored dataset"""
+
+    def __init__(self, relpath):
+        self.relpath = relpath
+        self.path = dataset_abspath(relpath)
+        with open(os.path.join(self.path, _META_FILE)) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta['rows']
+        self.types = self.meta['types']
+
+        self.numeric = {
+            col: self._map(filename, np.float64, self.rows)
+            for col, filename in _NUMERIC_FILES.items()
+        }
+        self.type_codes = self._map(_TYPE_CODES_FILE, np.int32, self.rows)
+        self.name_offsets = self._map(_NAME_OFFSETS_FILE, np.int64, self.rows + 1)
+        self.name_data = self._map(_NAME_DATA_FILE, np.uint8, int(self.name_offsets[-1]))
+
+    def _map(self, filename, dtype, length):
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, filename), dtype=dtype, mode='r', shape=(length,))
+
+    def __len__(self):
+        return self.rows
+
+    def name(self, index):
+        """Equipment name of one row"""
+        start, stop = self.name_offsets[index], self.name_offsets[index + 1]
+        return self.name_data[start:stop].tobytes().decode('utf-8')
+
+    def type_name(self, code):
+        """Equipment type for a stored type code"""
+        return self.types[code] if code >= 0 else None
+
+    def file_path(self, filename):
+        """Absolute path of a file inside the dataset directory"""
+        return os.path.join(self.path, filename)
+
+    def write_array(self, filename, values):
+        """Atomically store an extra array file in the dataset directory"""
+        path = self.file_path(filename)
+        tmp_path = f'{path}.{uuid.uuid4().hex}'
+        np.asarray(values).tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    def read_array(self, filename, dtype):
+        """Memory-map an extra array file, or None if it does not exist"""
+        path = self.file_path(filename)
+        if not os.path.exists(path):
+            return None
+        length = os.path.getsize(path) // np.dtype(dtype).itemsize
+        return self._map(filename, dtype, length)
+
+    def sort_keys(self, column):
+        """Array whose ascending order is the ascending order of column"""
+        if column in self.numeric:
+            return self.numeric[column]
+        if column == 'Type':
+            # Rank the type codes alphabetically; missing types sort last
+            ranks = np.empty(len(self.types) + 1, dtype=np.int64)
+            ranks[np.argsort(np.array(self.types, dtype=object))] = np.arange(len(self.types))
+            ranks[-1] = len(self.types)
+            return ranks[self.type_codes]
+        if column == 'Equipment Name':
+            return self.name_keys()
+        raise KeyError(column)
+
+    def name_keys(self):
+        """Names as a fixed-width bytes array (no per-row Python objects)
+
+        UTF-8 byte order is code point order, so sorting the raw bytes sorts
+        the names like str comparison does. Takes rows x longest name bytes.
+        """
+        starts = np.asarray(self.name_offsets[:-1])
+        lengths = np.diff(self.name_offsets)
+        width = int(lengths.max()) if self.rows else 0
+        if width == 0:
+            return np.zeros(self.rows, dtype='S1')
+        keys = np.zeros((self.rows, width), dtype=np.uint8)
+        rows = np.arange(self.rows)
+        for j in range(width):
+            # Byte j of every name that is longer than j bytes
+            rows = rows[lengths[rows] > j]
+            keys[rows, j] = self.name_data[starts[rows] + j]
+        return keys.view(f'S{width}').ravel()
+
+    def sort_index(self, column):
+        """Row indices ordered by column, built and stored on first use"""
+        filename = _sort_file(column)
+        if not os.path.exists(self.file_path(filename)):
+            order = np.argsort(self.sort_keys(column), kind='stable').astype(np.int64)
+            self.write_array(filename, order)
+        return self._map(filename, np.int64, self.rows)
+
+    def query(self, sort=None, descending=False, types=None, ranges=None,
+              offset=0, limit=100):
+        """Select a page of row indices
+
+        sort is a column name (natural row order when None), types a list of
+        equipment types to keep and ranges maps numeric columns to
+        (min, max) bounds, either of which may be None. Returns the number of
+        matching rows and the indices of the requested page.
+        """
+        if sort is None:
+            if types is None and not ranges and not descending:
+                stop = min(offset + limit, self.rows)
+                return self.rows, np.arange(offset, max(offset, stop), dtype=np.int64)
+            order = np.arange(self.rows, dtype=np.int64)
+        else:
+            order = self.sort_index(sort)
+        if descending:
+            order = order[::-1]
+
+        mask = None
+        if types is not None:
+            wanted = [code for code, name in enumerate(self.types) if name in set(types)]
+            mask = np.isin(self.type_codes, wanted)
+        for col, (low, high) in (ranges or {}).items():
+            values = self.numeric[col]
+            if low is not None:
+                mask = (values >= low) if mask is None else mask & (values >= low)
+            if high is not None:
+                mask = (values <= high) if mask is None else mask & (values <= high)
+
+        if mask is None:
+            # No filters: the stored order can be sliced directly
+            return self.rows, np.asarray(order[offset:offset + limit])
+
+        selected = order[mask[order]]
+        return int(selected.size), selected[offset:offset + limit]
+
+    def records(self, indices):
+        """Return rows at the given indices as dicts (like the upload's raw_data)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = {col: values[indices].tolist() for col, values in self.numeric.items()}
+        codes = self.type_codes[indices].tolist()
+        return [
+            {
+                'Equipment Name': self.name(index),
+                'Type': self.type_name(codes[i]),
+                **{col: columns[col][i] for col in NUMERIC_COLUMNS},
+            }
+            for i, index in enumerate(indices.tolist())
+        ]
+
+    def iter_chunks(self, chunksize):
+        """Yield the dataset as DataFrames of at most chunksize rows"""
+        for start in range(0, self.rows, chunksize):
+            stop = min(start + chunksize, self.rows)
+            frame = {
+                'Equipment Name': [self.name(i) for i in range(start, stop)],
+                'Type': pd.Categorical.from_codes(
+                    np.asarray(self.type_codes[start:stop]), categories=self.types
+                ),
+            }
+            for col in NUMERIC_COLUMNS:
+                frame[col] = np.asarray(self.numeric[col][start:stop])
+            yield pd.DataFrame(frame)
+
+
+def open_dataset(relpath):
+    """Open a stored dataset, or return None if it is not available"""
+    if not dataset_exists(relpath):
+        return None
+    return StoredDataset(relpath)
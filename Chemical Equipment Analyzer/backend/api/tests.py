@@ -0,0 +1,58 @@
+import io
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import analytics
+
+# Every spelling of a missing value the pandas engine recognizes, in each column
+MISSING_VALUES_CSV = b'''Equipment Name,Type,Flowrate,Pressure,Temperature
+P-1,Pump,120.5,5.2,80.1
+P-2,None,110.0,4.8,75.0
+P-3,NA,100.0,4.1,70.2
+None,Valve,95.5,3.9,65.0
+V-2,,90.0,3.5,60.5
+V-3,Valve,N/A,3.1,55.0
+V-4,Valve,nan,2.9,50.5
+V-5,"NULL",85.0,2.7,45.0
+C-1,Compressor,80.5,#N/A,40.0
+C-2,Compressor,75.0,2.5,null
+'''
+
+# Values that parse as infinite under one engine or both
+INFINITE_VALUES_CSV = b'''Equipment Name,Type,Flowrate,Pressure,Temperature
+P-1,Pump,120.5,5.2,80.1
+P-2,Pump,1e400,4.8,75.0
+V-1,Valve,inf,3.9,65.0
+V-2,Valve,90.0,-inf,60.5
+C-1,Compressor,80.5,2.5,-1e400
+'''
+
+
+@unittest.skipIf(analytics.pa is None, 'pyarrow is not installed')
+class CSVEngineTests(SimpleTestCase):
+    """The pyarrow and pandas parsers must produce the same analysis"""
+
+    def analyze(self, use_arrow, content=MISSING_VALUES_CSV):
+        pa = analytics.pa if use_arrow else None
+        with mock.patch.object(analytics, 'pa', pa):
+            return analytics.analyze_csv(io.BytesIO(content))
+
+    def test_missing_values_match(self):
+        arrow = self.analyze(use_arrow=True)
+        pandas = self.analyze(use_arrow=False)
+
+        self.assertEqual(arrow, pandas)
+        # Rows with a missing numeric value are dropped; missing types are not counted
+        self.assertEqual(arrow['total_equipment_count'], 6)
+        self.assertEqual(arrow['equipment_type_distribution'], {'Pump': 1, 'Valve': 1})
+
+    def test_infinite_values_match(self):
+        arrow = self.analyze(use_arrow=True, content=INFINITE_VALUES_CSV)
+        pandas = self.analyze(use_arrow=False, content=INFINITE_VALUES_CSV)
+
+        self.assertEqual(arrow, pandas)
+        # Rows with an infinite or overflowing value are dropped like missing ones
+        self.assertEqual(arrow['total_equipment_count'], 1)
+        self.assertEqual(arrow['avg_flowrate'], 120.5)
@@ -0,0 +1,56 @@
+"""
+Upload handlers that fingerprint uploaded files while they are received.
+
+The SHA-256 of the raw bytes is attached to the resulting UploadedFile as
+``content_hash``, so identical re-uploads can be recognized without a
+second pass over the data.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler, TemporaryFileUploadHandler
+)
+
+
+class HashingUploadMixin:
+    """Hash every chunk the wrapped handler consumes"""
+
+    def new_file(self, *args, **kwargs):
+        # Reset before super(), which may raise StopFutureHandlers
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            # The chunk was stored by this handler
+            self.hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.content_hash = self.hasher.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    """In-memory upload handler that records the content hash"""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    """Temporary-file upload handler that records the content hash"""
+
+
+def get_content_hash(uploaded_file):
+    """Return the SHA-256 of an uploaded file, hashing it now if needed"""
+    content_hash = getattr(uploaded_file, 'content_hash', None)
+    if content_hash:
+        return content_hash
+
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    uploaded_file.content_hash = hasher.hexdigest()
+    return uploaded_file.content_hash
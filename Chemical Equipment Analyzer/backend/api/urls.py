@@ -4,9 +4,17 @@ from . import views
 urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.login, name='login'),
+    path('logout/', views.logout, name='logout'),
     path('upload/', views.upload_csv, name='upload_csv'),
+    path('upload/batch/', views.upload_batch, name='upload_batch'),
+    path('jobs/<uuid:job_id>/', views.get_job, name='get_job'),
     path('history/', views.get_history, name='get_history'),
+    path('aggregate/', views.aggregate_summaries, name='aggregate_summaries'),
+    path('reports/export/', views.export_reports, name='export_reports'),
     path('summary/<int:summary_id>/', views.get_summary, name='get_summary'),
+    path('summary/<int:summary_id>/rows/', views.get_rows, name='get_rows'),
+    path('summary/<int:summary_id>/anomalies/', views.get_anomalies, name='get_anomalies'),
+    path('summary/<int:summary_id>/export/', views.export_dataset, name='export_dataset'),
     path('summary/<int:summary_id>/pdf/', views.generate_pdf, name='generate_pdf'),
 ]
 
@@ -1,29 +1,54 @@
 from rest_framework import status, viewsets
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Q, Sum
+from django.http import FileResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+import numpy as np
 import pandas as pd
 import json
 import os
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.units import inch
+from datetime import datetime, time
 
-from .models import DatasetSummary
-from .serializers import DatasetSummarySerializer
+from asgiref.sync import sync_to_async
 
+from .analytics import (
+    NUMERIC_COLUMNS, REQUIRED_COLUMNS, CSVValidationError, get_chunk_size,
+    merge_sufficient_statistics,
+)
+from .anomalies import describe_flags, load_anomalies
+from .async_views import async_api_view
+from .authentication import is_token_expired, token_expires_at
+from .cache import cached_response
+from .db import read_only_view
+from .jobs import (
+    collect_batch_items, discard_batch_items, enqueue_upload, fail_stale_jobs, process_batch,
+    schedule_prerender,
+)
+from .models import DatasetSummary, EquipmentTypeCount, UploadJob
+from .offload import analyze_upload_offloaded, open_report_offloaded
+from .renderers import DATA_RENDERERS
+from .reports import stream_report_archive
+from .retention import age_cutoff, max_per_user, prune_on_upload
+from .serializers import DatasetSummarySerializer, UploadJobSerializer
+from .services import analyze_upload, get_cached_analysis, save_summary
+from .storage import SORT_COLUMNS
+from .upload_handlers import get_content_hash
 
-@api_view(['POST'])
+# Page sizes for the stored-rows endpoint
+DEFAULT_ROWS_PAGE_SIZE = 100
+MAX_ROWS_PAGE_SIZE = 1000
+
+
+@async_api_view(['POST'])
 @permission_classes([AllowAny])
-def register(request):
+async def register(request):
     """Register a new user"""
     username = request.data.get('username')
     password = request.data.get('password')
@@ -35,14 +60,16 @@ def register(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    if User.objects.filter(username=username).exists():
+    if await User.objects.filter(username=username).aexists():
         return Response(
             {'error': 'Username already exists'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    user = User.objects.create_user(username=username, password=password, email=email)
-    token, created = Token.objects.get_or_create(user=user)
+    user = await sync_to_async(User.objects.create_user)(
+        username=username, password=password, email=email
+    )
+    token, created = await Token.objects.aget_or_create(user=user)
     
     return Response({
         'token': token.key,
@@ -51,9 +78,9 @@ def register(request):
     }, status=status.HTTP_201_CREATED)
 
 
-@api_view(['POST'])
+@async_api_view(['POST'])
 @permission_classes([AllowAny])
-def login(request):
+async def login(request):
     """Login and get authentication token"""
     username = request.data.get('username')
     password = request.data.get('password')
@@ -64,7 +91,8 @@ def login(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    user = authenticate(username=username, password=password)
+    # Password hashing runs in a thread; hashlib releases the GIL meanwhile
+    user = await sync_to_async(authenticate)(username=username, password=password)
     
     if not user:
         return Response(
@@ -72,17 +100,38 @@ def login(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    token, created = Token.objects.get_or_create(user=user)
+    token, created = await Token.objects.aget_or_create(user=user)
+    if is_token_expired(token):
+        # Rotate: the old key stops working everywhere once deleted
+        await token.adelete()
+        token = await Token.objects.acreate(user=user)
     
     return Response({
         'token': token.key,
         'user_id': user.id,
-        'username': user.username
+        'username': user.username,
+        'expires_at': token_expires_at(token),
     })
 
 
+@async_api_view(['POST'])
+@permission_classes([IsAuthenticated])
+async def logout(request):
+    """Revoke the token used for this request"""
+    if isinstance(request.auth, Token):
+        await request.auth.adelete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def _wants_async(request):
+    """Whether the client asked for the upload to be processed in the background"""
+    value = request.query_params.get('async', request.data.get('async', ''))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(DATA_RENDERERS)
 def upload_csv(request):
     """Upload and parse CSV file, compute analytics, and store summary"""
     if 'file' not in request.FILES:
@@ -100,82 +149,35 @@ def upload_csv(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    # Hashed while the upload was received; identical content reuses
+    # the stored analysis without parsing the file again
+    content_hash = get_content_hash(file)
+    result = get_cached_analysis(content_hash)
+    
+    if result is None and _wants_async(request):
+        # Analyze in the background worker pool and report a job to poll
+        job = enqueue_upload(request.user, file, content_hash)
+        serializer = UploadJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+    
     try:
-        # Read CSV with pandas
-        df = pd.read_csv(file)
+        if result is None:
+            # Stream the CSV through bounded chunks into running aggregates
+            # and persist the cleaned rows for later access
+            result = analyze_upload_offloaded(file, content_hash)
         
-        # Required columns
-        required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-        
-        # Check if all required columns exist (case-insensitive)
-        df_columns_lower = [col.strip().lower() for col in df.columns]
-        required_lower = [col.lower() for col in required_columns]
-        
-        missing_columns = []
-        column_mapping = {}
-        
-        for req_col in required_columns:
-            req_lower = req_col.lower()
-            found = False
-            for idx, col in enumerate(df.columns):
-                if col.strip().lower() == req_lower:
-                    column_mapping[req_col] = col
-                    found = True
-                    break
-            if not found:
-                missing_columns.append(req_col)
-        
-        if missing_columns:
-            return Response(
-                {'error': f'Missing required columns: {", ".join(missing_columns)}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Map columns to standard names
-        df_standard = df.rename(columns=column_mapping)
-        
-        # Convert numeric columns, handling errors
-        numeric_columns = ['Flowrate', 'Pressure', 'Temperature']
-        for col in numeric_columns:
-            df_standard[col] = pd.to_numeric(df_standard[col], errors='coerce')
-        
-        # Remove rows with missing numeric values
-        df_standard = df_standard.dropna(subset=numeric_columns)
-        
-        if len(df_standard) == 0:
-            return Response(
-                {'error': 'No valid data rows found after processing'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Compute summary statistics
-        total_count = len(df_standard)
-        avg_flowrate = float(df_standard['Flowrate'].mean())
-        avg_pressure = float(df_standard['Pressure'].mean())
-        avg_temperature = float(df_standard['Temperature'].mean())
-        
-        # Equipment type distribution
-        type_distribution = df_standard['Type'].value_counts().to_dict()
-        # Convert numpy types to native Python types
-        type_distribution = {str(k): int(v) for k, v in type_distribution.items()}
+        total_count = result['total_equipment_count']
+        avg_flowrate = result['avg_flowrate']
+        avg_pressure = result['avg_pressure']
+        avg_temperature = result['avg_temperature']
+        type_distribution = result['equipment_type_distribution']
         
         # Store summary (keep only last 5 per user)
-        summaries = DatasetSummary.objects.filter(user=request.user).order_by('-uploaded_at')
-        if summaries.count() >= 5:
-            # Delete oldest
-            summaries[4:].delete()
-        
-        # Create new summary
-        summary = DatasetSummary.objects.create(
-            user=request.user,
-            filename=file.name,
-            total_equipment_count=total_count,
-            avg_flowrate=avg_flowrate,
-            avg_pressure=avg_pressure,
-            avg_temperature=avg_temperature,
-        )
-        summary.set_type_distribution(type_distribution)
-        summary.save()
+        summary = save_summary(
+            request.user, file.name, result, content_hash,
+            restore=lambda: analyze_upload(file, content_hash)
+        )
+        schedule_prerender([summary.id])
         
         # Prepare response data
         response_data = {
@@ -187,11 +189,18 @@ def upload_csv(request):
             'avg_pressure': round(avg_pressure, 2),
             'avg_temperature': round(avg_temperature, 2),
             'equipment_type_distribution': type_distribution,
-            'raw_data': df_standard.to_dict('records')[:100]  # Limit to first 100 rows for response
+            'statistics': result['statistics'],
+            'anomalies': result.get('anomalies', {}),
+            'raw_data': result['raw_data']  # First 100 rows only
         }
         
         return Response(response_data, status=status.HTTP_201_CREATED)
         
+    except CSVValidationError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except pd.errors.EmptyDataError:
         return Response(
             {'error': 'CSV file is empty'},
@@ -204,34 +213,296 @@ def upload_csv(request):
         )
 
 
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def get_history(request):
-    """Get upload history (last 5 datasets)"""
-    summaries = DatasetSummary.objects.filter(user=request.user).order_by('-uploaded_at')[:5]
-    serializer = DatasetSummarySerializer(summaries, many=True)
-    return Response(serializer.data)
+@renderer_classes(DATA_RENDERERS)
+def upload_batch(request):
+    """Upload many CSV files (or ZIP archives of CSVs) and analyze them in parallel"""
+    files = request.FILES.getlist('files') or request.FILES.getlist('file')
+    if not files:
+        return Response(
+            {'error': 'No files provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        items = collect_batch_items(files)
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        items = process_batch(request.user, items)
+    except Exception as e:
+        discard_batch_items(items)
+        return Response(
+            {'error': f'Error processing batch: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    schedule_prerender([item['summary'].id for item in items if 'summary' in item])
+    
+    results = []
+    for item in items:
+        if 'summary' in item:
+            results.append({
+                'filename': item['filename'],
+                'status': 'ok',
+                'summary': DatasetSummarySerializer(item['summary']).data,
+            })
+        else:
+            results.append({
+                'filename': item['filename'],
+                'status': 'error',
+                'error': item['error'],
+            })
+    
+    succeeded = sum(1 for result in results if result['status'] == 'ok')
+    return Response(
+        {'succeeded': succeeded, 'failed': len(results) - succeeded, 'results': results},
+        status=status.HTTP_201_CREATED if succeeded else status.HTTP_400_BAD_REQUEST
+    )
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_summary(request, summary_id):
+@renderer_classes(DATA_RENDERERS)
+def get_job(request, job_id):
+    """Get the status of a background upload job"""
+    try:
+        job = UploadJob.objects.get(id=job_id, user=request.user)
+        if job.status in (UploadJob.STATUS_QUEUED, UploadJob.STATUS_RUNNING):
+            # Its worker may have died without reporting back
+            if fail_stale_jobs(Q(id=job.id)):
+                job.refresh_from_db()
+        serializer = UploadJobSerializer(job)
+        return Response(serializer.data)
+    except UploadJob.DoesNotExist:
+        return Response(
+            {'error': 'Job not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(DATA_RENDERERS)
+@read_only_view
+async def get_history(request):
+    """Get upload history (the datasets kept by the retention policy)"""
+    def build():
+        summaries = DatasetSummary.objects.filter(user=request.user)
+        # Expired or surplus summaries may not be pruned yet: show only what
+        # the policy will keep, before narrowing down by type
+        cutoff = age_cutoff()
+        if cutoff is not None:
+            summaries = summaries.filter(uploaded_at__gte=cutoff)
+        if not prune_on_upload():
+            newest = summaries.order_by('-uploaded_at', '-id').values_list('id', flat=True)
+            summaries = summaries.filter(id__in=list(newest[:max_per_user()]))
+        equipment_type = request.query_params.get('type')
+        if equipment_type:
+            summaries = summaries.filter(type_counts__equipment_type=equipment_type)
+        summaries = summaries.order_by('-uploaded_at').prefetch_related('type_counts')
+        serializer = DatasetSummarySerializer(summaries, many=True)
+        return Response(serializer.data)
+    
+    # Cache lookups, and the queries on a miss, run in a thread
+    return await sync_to_async(cached_response)(request, build)
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(DATA_RENDERERS)
+@read_only_view
+async def get_summary(request, summary_id):
     """Get detailed summary of a specific dataset"""
+    def build():
+        try:
+            summary = DatasetSummary.objects.prefetch_related('type_counts').get(
+                id=summary_id, user=request.user
+            )
+            serializer = DatasetSummarySerializer(summary)
+            return Response(serializer.data)
+        except DatasetSummary.DoesNotExist:
+            return Response(
+                {'error': 'Summary not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    # Cache lookups, and the queries on a miss, run in a thread
+    return await sync_to_async(cached_response)(request, build)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(DATA_RENDERERS)
+@read_only_view
+def aggregate_summaries(request):
+    """Combine statistics of several datasets without touching their rows"""
+    try:
+        summaries = _select_summaries(request.user, request.query_params)
+    except ValueError as e:
+        return Response(
+            {'error': f'Invalid query: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if summaries is None:
+        return Response(
+            {'error': 'Provide summary ids or a start/end date range'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    rows = list(summaries.values('id', 'sufficient_statistics'))
+    if not rows:
+        return Response(
+            {'error': 'No matching summaries found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    statistics = merge_sufficient_statistics(row['sufficient_statistics'] for row in rows)
+    type_distribution = (
+        EquipmentTypeCount.objects
+        .filter(summary_id__in=[row['id'] for row in rows])
+        .values('equipment_type')
+        .annotate(total=Sum('count'))
+        .order_by('-total', 'equipment_type')
+    )
+    
+    return Response({
+        'summary_ids': [row['id'] for row in rows],
+        'dataset_count': len(rows),
+        'total_equipment_count': statistics[NUMERIC_COLUMNS[0]]['count'],
+        'avg_flowrate': statistics['Flowrate']['mean'],
+        'avg_pressure': statistics['Pressure']['mean'],
+        'avg_temperature': statistics['Temperature']['mean'],
+        'equipment_type_distribution': {
+            row['equipment_type']: row['total'] for row in type_distribution
+        },
+        'statistics': statistics,
+    })
+
+
+def _select_summaries(user, params):
+    """A user's summaries chosen by ?ids= and/or ?start=/&end=, or None if neither is given"""
+    ids_param = params.get('ids', '')
+    start_param = params.get('start')
+    end_param = params.get('end')
+    if not ids_param and not start_param and not end_param:
+        return None
+    
+    summaries = DatasetSummary.objects.filter(user=user)
+    if ids_param:
+        ids = [int(value) for value in ids_param.split(',') if value.strip()]
+        summaries = summaries.filter(id__in=ids)
+    if start_param:
+        summaries = summaries.filter(uploaded_at__gte=_parse_bound(start_param))
+    if end_param:
+        summaries = summaries.filter(uploaded_at__lte=_parse_bound(end_param, end=True))
+    return summaries
+
+
+def _parse_bound(value, end=False):
+    """Parse an ISO date or datetime query bound (a bare end date is inclusive)"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{value} is not an ISO date or datetime')
+        parsed = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_row_query(params):
+    """Translate rows endpoint query parameters into StoredDataset.query() arguments"""
+    offset = int(params.get('offset', 0))
+    limit = int(params.get('limit', DEFAULT_ROWS_PAGE_SIZE))
+    if offset < 0 or not 1 <= limit <= MAX_ROWS_PAGE_SIZE:
+        raise ValueError(f'offset must be >= 0 and limit between 1 and {MAX_ROWS_PAGE_SIZE}')
+    
+    sort = None
+    descending = False
+    sort_param = params.get('sort', '').strip()
+    if sort_param:
+        descending = sort_param.startswith('-')
+        key = sort_param.lstrip('-').replace('_', ' ').lower()
+        if key not in SORT_COLUMNS:
+            raise ValueError(f'Cannot sort by {sort_param.lstrip("-")}')
+        sort = SORT_COLUMNS[key]
+    
+    types = None
+    type_params = [t for value in params.getlist('type') for t in value.split(',') if t]
+    if type_params:
+        types = type_params
+    
+    ranges = {}
+    for col in NUMERIC_COLUMNS:
+        low = params.get(f'min_{col.lower()}')
+        high = params.get(f'max_{col.lower()}')
+        if low is not None or high is not None:
+            ranges[col] = (
+                float(low) if low is not None else None,
+                float(high) if high is not None else None,
+            )
+    
+    return {
+        'sort': sort, 'descending': descending, 'types': types,
+        'ranges': ranges, 'offset': offset, 'limit': limit,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(DATA_RENDERERS)
+@read_only_view
+def get_rows(request, summary_id):
+    """Get a page of stored rows, optionally sorted and filtered"""
     try:
         summary = DatasetSummary.objects.get(id=summary_id, user=request.user)
-        serializer = DatasetSummarySerializer(summary)
-        return Response(serializer.data)
     except DatasetSummary.DoesNotExist:
         return Response(
             {'error': 'Summary not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+    
+    dataset = summary.open_dataset()
+    if dataset is None:
+        return Response(
+            {'error': 'Dataset rows are not stored for this summary'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        query = _parse_row_query(request.query_params)
+    except ValueError as e:
+        return Response(
+            {'error': f'Invalid query: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    count, indices = dataset.query(**query)
+    results = [
+        {'row': int(index), **record}
+        for index, record in zip(indices, dataset.records(indices))
+    ]
+    
+    return Response({
+        'count': count,
+        'offset': query['offset'],
+        'limit': query['limit'],
+        'results': results,
+    })
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def generate_pdf(request, summary_id):
-    """Generate and return PDF report for a dataset summary"""
+@renderer_classes(DATA_RENDERERS)
+@read_only_view
+def get_anomalies(request, summary_id):
+    """Get outlier counts and a page of flagged rows with the failed tests"""
     try:
         summary = DatasetSummary.objects.get(id=summary_id, user=request.user)
     except DatasetSummary.DoesNotExist:
@@ -240,92 +511,161 @@ def generate_pdf(request, summary_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Create PDF in memory
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    story = []
+    dataset = summary.open_dataset()
+    flagged = load_anomalies(dataset) if dataset is not None else None
+    if flagged is None:
+        return Response(
+            {'error': 'Anomalies are not available for this summary'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    rows, flags = flagged
     
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1a1a1a'),
-        spaceAfter=30,
-    )
+    try:
+        offset = int(request.query_params.get('offset', 0))
+        limit = int(request.query_params.get('limit', DEFAULT_ROWS_PAGE_SIZE))
+        if offset < 0 or not 1 <= limit <= MAX_ROWS_PAGE_SIZE:
+            raise ValueError(f'offset must be >= 0 and limit between 1 and {MAX_ROWS_PAGE_SIZE}')
+    except ValueError as e:
+        return Response(
+            {'error': f'Invalid query: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Title
-    story.append(Paragraph("Chemical Equipment Analysis Report", title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # File info
-    story.append(Paragraph(f"<b>File:</b> {summary.filename}", styles['Normal']))
-    story.append(Paragraph(f"<b>Uploaded:</b> {summary.uploaded_at.strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Summary Statistics
-    story.append(Paragraph("<b>Summary Statistics</b>", styles['Heading2']))
-    story.append(Spacer(1, 0.1*inch))
-    
-    summary_data = [
-        ['Metric', 'Value'],
-        ['Total Equipment Count', str(summary.total_equipment_count)],
-        ['Average Flowrate', f"{summary.avg_flowrate:.2f}"],
-        ['Average Pressure', f"{summary.avg_pressure:.2f}"],
-        ['Average Temperature', f"{summary.avg_temperature:.2f}"],
+    page_rows = np.asarray(rows[offset:offset + limit])
+    page_flags = np.asarray(flags[offset:offset + limit]).tolist()
+    results = [
+        {'row': int(index), **record, 'flags': describe_flags(bits)}
+        for index, record, bits in zip(page_rows, dataset.records(page_rows), page_flags)
     ]
     
-    summary_table = Table(summary_data)
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    
-    story.append(summary_table)
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Equipment Type Distribution
-    story.append(Paragraph("<b>Equipment Type Distribution</b>", styles['Heading2']))
-    story.append(Spacer(1, 0.1*inch))
-    
-    type_dist = summary.get_type_distribution()
-    if type_dist:
-        dist_data = [['Equipment Type', 'Count']]
-        for eq_type, count in type_dist.items():
-            dist_data.append([str(eq_type), str(count)])
-        
-        dist_table = Table(dist_data)
-        dist_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        
-        story.append(dist_table)
+    return Response({
+        'summary': summary.anomalies,
+        'count': int(rows.size),
+        'offset': offset,
+        'limit': limit,
+        'results': results,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_only_view
+def export_dataset(request, summary_id):
+    """Stream the stored cleaned rows of a dataset back as CSV"""
+    try:
+        summary = DatasetSummary.objects.get(id=summary_id, user=request.user)
+    except DatasetSummary.DoesNotExist:
+        return Response(
+            {'error': 'Summary not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
     
-    # Build PDF
-    doc.build(story)
+    dataset = summary.open_dataset()
+    if dataset is None:
+        return Response(
+            {'error': 'Dataset rows are not stored for this summary'},
+            status=status.HTTP_404_NOT_FOUND
+        )
     
-    # Get PDF content
-    buffer.seek(0)
-    pdf_content = buffer.getvalue()
-    buffer.close()
+    def rows():
+        yield ','.join(REQUIRED_COLUMNS) + '\n'
+        for chunk in dataset.iter_chunks(get_chunk_size()):
+            yield chunk.to_csv(header=False, index=False)
     
-    # Return PDF as response
-    from django.http import HttpResponse
-    response = HttpResponse(pdf_content, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="report_{summary.id}.pdf"'
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="dataset_{summary.id}.csv"'
     return response
 
+
+def _report_variant(params):
+    """Report variant for ?mode= and ?rows= (see api.reports.VARIANTS)"""
+    mode = params.get('mode', 'summary')
+    if mode not in ('summary', 'full'):
+        raise ValueError('mode must be summary or full')
+    return 'rows' if mode == 'full' and params.get('rows') in ('1', 'true') else mode
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_only_view
+def generate_pdf(request, summary_id):
+    """Generate and return PDF report for a dataset summary
+    
+    ?mode=full adds charts, per-type statistics and outlier counts;
+    add &rows=1 to list the stored rows as well.
+    """
+    try:
+        variant = _report_variant(request.query_params)
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        summary = DatasetSummary.objects.prefetch_related('type_counts').get(
+            id=summary_id, user=request.user
+        )
+    except DatasetSummary.DoesNotExist:
+        return Response(
+            {'error': 'Summary not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        report = open_report_offloaded(summary, variant)
+    except Exception as e:
+        return Response(
+            {'error': f'Error generating PDF: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    # Served straight from the report cache
+    return FileResponse(
+        report,
+        as_attachment=True,
+        filename=f'report_{summary.id}.pdf' if variant == 'summary' else f'report_{summary.id}_{variant}.pdf',
+        content_type='application/pdf',
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_reports(request):
+    """Download the PDF reports of several datasets as one streamed ZIP
+    
+    Select datasets with ?ids=1,2,3 and/or ?start=/&end= dates; ?mode= and
+    ?rows= choose the report variant as for a single report.
+    """
+    try:
+        variant = _report_variant(request.query_params)
+        summaries = _select_summaries(request.user, request.query_params)
+    except ValueError as e:
+        return Response(
+            {'error': f'Invalid query: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if summaries is None:
+        return Response(
+            {'error': 'Provide summary ids or a start/end date range'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    max_reports = getattr(settings, 'REPORT_EXPORT_MAX', 500)
+    summaries = list(summaries.order_by('uploaded_at', 'id').values('id', 'filename')[:max_reports + 1])
+    if not summaries:
+        return Response(
+            {'error': 'No matching summaries found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if len(summaries) > max_reports:
+        return Response(
+            {'error': f'At most {max_reports} reports can be exported at once'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    response = StreamingHttpResponse(
+        stream_report_archive(summaries, variant), content_type='application/zip'
+    )
+    response['Content-Disposition'] = 'attachment; filename="reports.zip"'
+    return response
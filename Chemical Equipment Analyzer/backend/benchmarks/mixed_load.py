@@ -0,0 +1,216 @@
+"""
+Benchmark: light API requests while large uploads are being analyzed.
+
+Each configuration starts a single server process on a temporary database.
+Upload clients keep posting distinct CSV files of --rows rows while light
+clients poll the history and summary endpoints; the light request rate and
+latency show how well one process keeps serving while heavy work runs.
+
+    wsgi          gunicorn, 1 worker x 16 threads, uploads analyzed in the request thread
+    wsgi-offload  the same, uploads analyzed on the worker pool (OFFLOAD_CPU_WORK)
+    asgi          uvicorn, 1 worker, async history/summary views, worker pool
+
+Needs gunicorn and uvicorn. Usage (from the backend directory):
+
+    python benchmarks/mixed_load.py [--light 16] [--uploads 2] [--duration 20]
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = {
+    'wsgi': {
+        'command': ['gunicorn', 'equipment_analyzer.wsgi:application',
+                    '--worker-class', 'gthread', '--workers', '1', '--threads', '16',
+                    '--bind', '127.0.0.1:{port}'],
+        'offload': False,
+    },
+    'wsgi-offload': {
+        'command': ['gunicorn', 'equipment_analyzer.wsgi:application',
+                    '--worker-class', 'gthread', '--workers', '1', '--threads', '16',
+                    '--bind', '127.0.0.1:{port}'],
+        'offload': True,
+    },
+    'asgi': {
+        'command': ['uvicorn', 'equipment_analyzer.asgi:application', '--workers', '1',
+                    '--port', '{port}', '--log-level', 'warning'],
+        'offload': True,
+    },
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_csv(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    types = np.array(['Pump', 'Valve', 'Compressor', 'Reactor', 'Heat Exchanger'])
+    lines = ['Equipment Name,Type,Flowrate,Pressure,Temperature']
+    names = rng.integers(0, 10 ** 6, rows)
+    kinds = types[rng.integers(0, len(types), rows)]
+    values = rng.normal([120, 5, 100], [20, 1, 15], (rows, 3))
+    lines += [
+        f'E-{name},{kind},{flow:.2f},{pressure:.2f},{temp:.2f}'
+        for name, kind, (flow, pressure, temp) in zip(names, kinds, values)
+    ]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def request(url, token=None, data=None, content_type=None):
+    headers = {}
+    if token:
+        headers['Authorization'] = f'Token {token}'
+    if content_type:
+        headers['Content-Type'] = content_type
+    req = urllib.request.Request(url, data=data, headers=headers)
+    with urllib.request.urlopen(req, timeout=300) as response:
+        return response.status, response.read()
+
+
+def multipart(filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def run(config_name, light, uploads, duration, rows):
+    config = CONFIGS[config_name]
+    tmp_dir = tempfile.mkdtemp()
+    port = free_port()
+    base = f'http://127.0.0.1:{port}/api'
+    env = {
+        **os.environ,
+        'DB_NAME': os.path.join(tmp_dir, 'bench.sqlite3'),
+        'MEDIA_ROOT': os.path.join(tmp_dir, 'media'),
+        'CACHE_DIR': os.path.join(tmp_dir, 'cache'),
+        'OFFLOAD_CPU_WORK': '1' if config['offload'] else '0',
+        # Keep every upload in the history the light clients read
+        'HISTORY_MAX_PER_USER': '1000',
+    }
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=BACKEND_DIR, env=env, check=True)
+    server = subprocess.Popen(
+        [part.format(port=port) for part in config['command']],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.2)
+
+        _, body = request(f'{base}/register/', data=json.dumps(
+            {'username': 'bench', 'password': 'bench-password'}).encode(), content_type='application/json')
+        token = json.loads(body)['token']
+        # Warm up: one stored summary for the light clients, and the worker pool
+        seed_csv = make_csv(1000)
+        _, body = request(f'{base}/upload/', token, *multipart('seed.csv', seed_csv))
+        summary_id = json.loads(body)['id']
+
+        base_csv = make_csv(rows, seed=1)
+        stop = threading.Event()
+        lock = threading.Lock()
+        latencies, upload_times, errors = [], [], []
+
+        def light_client(i):
+            urls = [f'{base}/history/', f'{base}/summary/{summary_id}/']
+            n = i
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    request(urls[n % 2], token)
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+                except (urllib.error.URLError, OSError) as e:
+                    with lock:
+                        errors.append(f'light: {e}')
+                n += 1
+
+        def upload_client(i):
+            n = 0
+            while not stop.is_set():
+                # A unique last row makes every upload a new analysis
+                content = base_csv + f'E-{i}-{n},Pump,1,1,1\n'.encode()
+                start = time.perf_counter()
+                try:
+                    request(f'{base}/upload/', token, *multipart(f'u{i}-{n}.csv', content))
+                    with lock:
+                        upload_times.append(time.perf_counter() - start)
+                except (urllib.error.URLError, OSError) as e:
+                    with lock:
+                        errors.append(f'upload: {e}')
+                n += 1
+
+        threads = [threading.Thread(target=upload_client, args=(i,)) for i in range(uploads)]
+        threads += [threading.Thread(target=light_client, args=(i,)) for i in range(light)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    latencies.sort()
+    return {
+        'config': config_name,
+        'light_per_sec': round(len(latencies) / duration, 1),
+        'light_p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'light_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+        'uploads': len(upload_times),
+        'upload_avg_s': round(statistics.mean(upload_times), 2) if upload_times else None,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--light', type=int, default=16, help='clients polling history/summary')
+    parser.add_argument('--uploads', type=int, default=2, help='clients uploading CSV files')
+    parser.add_argument('--rows', type=int, default=300000, help='rows per uploaded file')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--config', choices=CONFIGS, action='append', help='run only these configurations')
+    args = parser.parse_args()
+
+    results = [
+        run(name, args.light, args.uploads, args.duration, args.rows)
+        for name in args.config or CONFIGS
+    ]
+    columns = ['config', 'light_per_sec', 'light_p50_ms', 'light_p95_ms', 'uploads', 'upload_avg_s', 'errors']
+    print('  '.join(f'{col:>13}' for col in columns))
+    for result in results:
+        print('  '.join(f'{str(result[col]):>13}' for col in columns))
+    for result in results:
+        if result['first_error']:
+            print(f"{result['config']}: first error: {result['first_error']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmark: history reads while uploads are being written.
+
+A writer process repeatedly stores batches of summaries in long transactions
+(like a large batch upload) while reader threads poll the history endpoint
+of another user. Each configuration runs in a fresh process against a
+temporary SQLite database:
+
+    baseline  rollback journal, sqlite3's default 5 s timeout, reads on the default connection
+    tuned     WAL, busy timeout, reads routed to the read-only connection
+
+Usage (from the backend directory):
+
+    python benchmarks/read_write_concurrency.py [--readers 8] [--duration 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = {
+    'baseline': {'journal_mode': 'DELETE', 'busy_timeout': 5, 'replica': False},
+    'tuned': {'journal_mode': 'WAL', 'busy_timeout': 20, 'replica': True},
+}
+
+
+def setup_django(config, db_path, migrate=True):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'equipment_analyzer.settings')
+    from django.conf import settings
+    import django
+
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DATABASES['default']['OPTIONS'] = {'timeout': config['busy_timeout']}
+    if config['replica']:
+        settings.DATABASES['replica']['NAME'] = f'file:{db_path}?mode=ro'
+        settings.DATABASES['replica']['OPTIONS'] = {'timeout': config['busy_timeout'], 'uri': True}
+    else:
+        settings.DATABASES.pop('replica', None)
+    settings.SQLITE_JOURNAL_MODE = config['journal_mode']
+    settings.SQLITE_BUSY_TIMEOUT = config['busy_timeout']
+    # Measure the database, not the response cache
+    settings.RESPONSE_CACHE_MAX_ENTRIES = 0
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.MEDIA_ROOT = os.path.dirname(db_path)
+    django.setup()
+
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def fake_result(i, types=50):
+    """Analysis result shaped like a real upload with `types` equipment types"""
+    columns = ['Flowrate', 'Pressure', 'Temperature']
+    column_stats = {
+        'count': 100, 'min': 0.0, 'max': 1.0, 'mean': 0.5, 'std': 0.1,
+        'p50': 0.5, 'p90': 0.9, 'p99': 0.99,
+    }
+    by_type = {f'Type{t}': {col: dict(column_stats) for col in columns} for t in range(types)}
+    return {
+        'total_equipment_count': 100 * types,
+        'avg_flowrate': float(i), 'avg_pressure': 1.0, 'avg_temperature': 1.0,
+        'statistics': {'overall': by_type['Type0'], 'by_type': by_type},
+        'sufficient_statistics': {col: {} for col in columns},
+        'equipment_type_distribution': {name: 100 for name in by_type},
+    }
+
+
+def write(config_name, db_path, duration, batch_size, hold):
+    """Writer process: store summary batches until duration has elapsed"""
+    setup_django(CONFIGS[config_name], db_path, migrate=False)
+    from django.contrib.auth.models import User
+    from django.db import transaction
+
+    from api.services import save_summaries
+
+    user = User.objects.get(username='writer')
+    deadline = time.monotonic() + duration
+    batches, errors = 0, []
+    while time.monotonic() < deadline:
+        try:
+            with transaction.atomic():
+                save_summaries(user, [
+                    (f'w{batches}-{j}.csv', fake_result(j), '') for j in range(batch_size)
+                ])
+                # Hold the write transaction open like a slow batch upload
+                time.sleep(hold)
+            batches += 1
+        except Exception as e:
+            errors.append(str(e))
+    return {'write_batches': batches, 'write_errors': len(errors)}
+
+
+def run(config_name, readers, duration, batch_size, hold):
+    """Reader process: poll history while a writer process runs"""
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, 'bench.sqlite3')
+    setup_django(CONFIGS[config_name], db_path)
+
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from rest_framework.test import APIClient
+
+    from api.services import save_summaries
+
+    User.objects.create_user('writer')
+    reader_user = User.objects.create_user('reader')
+    save_summaries(reader_user, [(f'r{i}.csv', fake_result(i), '') for i in range(5)])
+    connections.close_all()
+
+    writer = subprocess.Popen(
+        [sys.executable, __file__, '--config', config_name, '--writer', db_path,
+         '--duration', str(duration), '--batch-size', str(batch_size), '--hold', str(hold)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    # Let the writer get going before measuring
+    time.sleep(1)
+
+    stop = threading.Event()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def reader():
+        client = APIClient()
+        client.force_authenticate(reader_user)
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                response = client.get('/api/history/')
+                ok = response.status_code == 200
+            except Exception as e:
+                ok = False
+                with lock:
+                    errors.append(f'read: {e}')
+            elapsed = time.perf_counter() - start
+            if ok:
+                with lock:
+                    latencies.append(elapsed)
+        connections.close_all()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration - 1)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    write_result = json.loads(writer.communicate()[0].strip().splitlines()[-1])
+
+    latencies.sort()
+    measured = duration - 1
+    return {
+        'config': config_name,
+        'reads': len(latencies),
+        'reads_per_sec': round(len(latencies) / measured, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+        'read_errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        **write_result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--batch-size', type=int, default=100, help='summaries per write transaction')
+    parser.add_argument('--hold', type=float, default=0.2, help='seconds each write transaction stays open')
+    parser.add_argument('--config', choices=CONFIGS, help='run one configuration in this process')
+    parser.add_argument('--writer', metavar='DB_PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.writer:
+        print(json.dumps(write(args.config, args.writer, args.duration, args.batch_size, args.hold)))
+        return
+    if args.config:
+        print(json.dumps(run(args.config, args.readers, args.duration, args.batch_size, args.hold)))
+        return
+
+    results = []
+    for name in CONFIGS:
+        output = subprocess.run(
+            [sys.executable, __file__, '--config', name, '--readers', str(args.readers),
+             '--duration', str(args.duration), '--batch-size', str(args.batch_size),
+             '--hold', str(args.hold)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    columns = [
+        'config', 'reads', 'reads_per_sec', 'p50_ms', 'p95_ms', 'max_ms',
+        'read_errors', 'write_batches', 'write_errors',
+    ]
+    print('  '.join(f'{col:>13}' for col in columns))
+    for result in results:
+        print('  '.join(f'{str(result[col]):>13}' for col in columns))
+    for result in results:
+        if result['first_error']:
+            print(f"{result['config']}: first error: {result['first_error']}")
+
+
+if __name__ == '__main__':
+    main()
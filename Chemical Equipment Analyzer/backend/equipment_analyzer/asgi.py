@@ -0,0 +1,18 @@
+"""
+ASGI config for equipment_analyzer project.
+
+Serve with an ASGI server, for example:
+
+    uvicorn equipment_analyzer.asgi:application --workers 2
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'equipment_analyzer.settings')
+# Each ASGI request runs its database work on a fresh thread, so persistent
+# connections would pile up instead of being reused
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+
+application = get_asgi_application()
@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.AsyncStreamingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,17 +68,59 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'equipment_analyzer.wsgi.application'
+ASGI_APPLICATION = 'equipment_analyzer.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Configured from DB_* environment variables (any Django engine); an optional
+# read replica is configured the same way from DB_REPLICA_*. Without one,
+# SQLite reads use a second, read-only connection to the same file.
+def _database(prefix, defaults=None):
+    defaults = defaults or {}
+    engine = os.environ.get(f'{prefix}_ENGINE', defaults.get('ENGINE', 'django.db.backends.sqlite3'))
+    database = {
+        'ENGINE': engine,
+        'NAME': os.environ.get(f'{prefix}_NAME', defaults.get('NAME', str(BASE_DIR / 'db.sqlite3'))),
+        # Keep connections open between requests (seconds)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
+    if engine.endswith('sqlite3'):
+        database['OPTIONS'] = {'timeout': SQLITE_BUSY_TIMEOUT}
+    else:
+        for key in ['USER', 'PASSWORD', 'HOST', 'PORT']:
+            database[key] = os.environ.get(f'{prefix}_{key}', defaults.get(key, ''))
+    return database
+
+
+# Seconds a SQLite writer waits for a lock before failing, and the journal
+# mode set on every connection (WAL lets reads proceed during writes)
+SQLITE_BUSY_TIMEOUT = 20
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+
+DATABASES = {
+    'default': _database('DB'),
 }
+if any(key.startswith('DB_REPLICA_') for key in os.environ):
+    DATABASES['replica'] = _database('DB_REPLICA', DATABASES['default'])
+elif DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': f"file:{DATABASES['default']['NAME']}?mode=ro",
+        'OPTIONS': {**DATABASES['default']['OPTIONS'], 'uri': True},
+        'READ_ONLY': True,
+    }
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.db.ReadReplicaRouter']
+
+# Alias read-only views query, and how long after a write a user keeps
+# reading from the primary
+READ_REPLICA_ALIAS = 'replica'
+REPLICA_STICKY_SECONDS = 5
 
 
 # Password validation
@@ -115,7 +159,7 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 MEDIA_URL = 'media/'
-MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -125,7 +169,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -138,6 +182,12 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Token authentication: seconds a resolved token is cached per process
+# (also the longest a revoked token keeps working in other processes), and
+# optional token lifetime (unset = tokens never expire)
+TOKEN_CACHE_TTL = 60
+TOKEN_EXPIRY_SECONDS = int(os.environ.get('TOKEN_EXPIRY_SECONDS', 0)) or None
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -146,3 +196,57 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Shared between the web and worker processes (see api.cache)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+    }
+}
+
+# Serialized history/summary responses kept per process (LRU)
+RESPONSE_CACHE_MAX_ENTRIES = 512
+
+# CSV ingestion: rows parsed per chunk (bounds peak memory per upload)
+CSV_CHUNK_SIZE = int(os.environ.get('CSV_CHUNK_SIZE', 50000))
+
+# Uploads are fingerprinted (SHA-256) while they are received
+FILE_UPLOAD_HANDLERS = [
+    'api.upload_handlers.HashingMemoryFileUploadHandler',
+    'api.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Background upload jobs: size of the local analysis process pool
+# (defaults to the number of CPU cores)
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 0)) or None
+# Seconds without progress after which a queued or running job is failed
+UPLOAD_JOB_TIMEOUT = int(os.environ.get('UPLOAD_JOB_TIMEOUT', 3600))
+# Analyze uploads and render reports requested inline on that pool as well,
+# instead of in the request thread (see api.offload)
+OFFLOAD_CPU_WORK = os.environ.get('OFFLOAD_CPU_WORK', '1') != '0'
+
+# History retention: summaries kept per user and optional maximum age.
+# With HISTORY_PRUNE_ON_UPLOAD off, run `manage.py prune_history` instead.
+HISTORY_MAX_PER_USER = int(os.environ.get('HISTORY_MAX_PER_USER', 5))
+HISTORY_MAX_AGE_DAYS = int(os.environ.get('HISTORY_MAX_AGE_DAYS', 0)) or None
+HISTORY_PRUNE_ON_UPLOAD = os.environ.get('HISTORY_PRUNE_ON_UPLOAD', '1') != '0'
+
+# Rendered PDF reports: total size of the on-disk cache, and whether to
+# render reports in the background right after upload
+REPORT_CACHE_MAX_BYTES = 256 * 1024 ** 2
+REPORT_PRERENDER = os.environ.get('REPORT_PRERENDER', '0') == '1'
+# Rows listed in full reports requested with ?rows=1
+REPORT_MAX_ROWS = 100000
+# Reports per bulk ZIP export
+REPORT_EXPORT_MAX = 500
+
+# Outlier detection on upload: z-score limit and IQR fence multiplier,
+# applied per equipment type
+ANOMALY_Z_THRESHOLD = 3.0
+ANOMALY_IQR_MULTIPLIER = 1.5
+
+# Batch uploads: maximum CSV files per request (after expanding ZIP archives)
+# and total uncompressed size of an archive
+BATCH_MAX_FILES = 100
+BATCH_MAX_UNCOMPRESSED_BYTES = 10 * 1024 ** 3
+
@@ -1,19 +1,154 @@
 import requests
 import os
-from typing import Optional, Dict, List
+import shutil
+from typing import Callable, Optional, Dict, List, Tuple, Union
 
-API_BASE_URL = 'http://localhost:8000/api'
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .local_cache import LocalCache
+from .multipart import MultipartFileStream
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+API_BASE_URL = os.environ.get('EQUIPMENT_API_URL', 'http://localhost:8000/api')
+
+# (connect, read) timeouts in seconds; uploads and reports wait longer for
+# the server to finish analyzing or rendering
+DEFAULT_TIMEOUT = (5, 30)
+LONG_TIMEOUT = (5, 600)
+
+# Transient failures (connection errors, gateway errors) are retried with
+# exponential backoff: 0.5 s, 1 s, 2 s, ... Uploads are only retried when
+# the connection could not be made, so a file is never stored twice.
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (502, 503, 504)
+
+# Connections kept open to the server for reuse
+POOL_SIZE = 10
+
+Timeout = Union[float, Tuple[float, float]]
+Progress = Callable[[int, int], None]
+
+
+class Cancelled(Exception):
+    """The caller cancelled a transfer before it completed"""
+
+
+class AuthenticationRequired(Exception):
+    """The server no longer accepts the token; the user must log in again"""
+
+
+# Row pages are requested column-wise: MessagePack when available, else JSON
+COLUMNAR_JSON = 'application/vnd.equipment.columnar+json'
+MSGPACK = 'application/msgpack'
+
+
+def columns_to_records(columnar: Dict) -> List[Dict]:
+    """Turn a {'columns': [...], 'data': [[...], ...]} block back into row dicts"""
+    columns = columnar['columns']
+    return [dict(zip(columns, values)) for values in zip(*columnar['data'])]
 
 
 class APIClient:
-    def __init__(self):
+    def __init__(
+        self,
+        base_url: str = API_BASE_URL,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        long_timeout: Timeout = LONG_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        on_request: Optional[Callable[[str, str, int, float], None]] = None,
+        cache: Optional[LocalCache] = None,
+    ):
+        """
+        on_request(method, url, status_code, seconds) is called after every
+        request, with the time until the response headers arrived.
+        
+        With a cache, history and summaries are revalidated against the
+        cached copy (If-None-Match), reports are downloaded once, and the
+        login session is remembered across restarts.
+        """
         self.token: Optional[str] = None
-        self.base_url = API_BASE_URL
+        self.username: Optional[str] = None
+        self.cache = cache
+        self.base_url = base_url
+        self.timeout = timeout
+        self.long_timeout = long_timeout
+        self.on_request = on_request
+        self.session = self._create_session(retries)
+    
+    def _create_session(self, retries: int) -> requests.Session:
+        """Keep-alive session with pooled connections and retries"""
+        session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+            # Only idempotent requests are retried after reaching the server
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.hooks['response'].append(self._report_timing)
+        return session
+    
+    def _report_timing(self, response, *args, **kwargs):
+        if self.on_request is not None:
+            self.on_request(
+                response.request.method, response.url,
+                response.status_code, response.elapsed.total_seconds()
+            )
+    
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a request to the API on the shared session"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, f'{self.base_url}{path}', **kwargs)
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
     
     def set_token(self, token: str):
         """Set authentication token"""
         self.token = token
     
+    def _start_session(self, data: Dict):
+        self.token = data.get('token')
+        self.username = data.get('username')
+        if self.cache is not None and self.token:
+            self.cache.save_session(self.base_url, self.username, self.token)
+    
+    def restore_session(self) -> bool:
+        """Resume the session saved by the last login, if any"""
+        session = self.cache.load_session(self.base_url) if self.cache is not None else None
+        if session is None:
+            return False
+        self.username, self.token = session
+        return True
+    
+    def end_session(self):
+        """Forget the token here and in the saved session"""
+        self.token = None
+        if self.cache is not None:
+            self.cache.clear_session(self.base_url)
+    
+    def _cache_scope(self) -> Optional[str]:
+        """Key of the current user's cache entries, or None without a cache"""
+        if self.cache is None or not self.username:
+            return None
+        return f'{self.base_url}|{self.username}'
+    
+    def _check_auth(self, response: requests.Response):
+        if response.status_code == 401:
+            self.end_session()
+            raise AuthenticationRequired('Session expired, please log in again')
+    
     def _get_headers(self) -> Dict:
         """Get headers with authentication"""
         headers = {'Content-Type': 'application/json'}
@@ -23,95 +158,215 @@ class APIClient:
     
     def register(self, username: str, password: str, email: str = '') -> Dict:
         """Register a new user"""
-        response = requests.post(
-            f'{self.base_url}/register/',
+        response = self._request(
+            'POST', '/register/',
             json={'username': username, 'password': password, 'email': email}
         )
         if response.status_code == 201:
             data = response.json()
-            self.token = data.get('token')
+            self._start_session(data)
             return data
         else:
             raise Exception(response.json().get('error', 'Registration failed'))
     
     def login(self, username: str, password: str) -> Dict:
         """Login and get token"""
-        response = requests.post(
-            f'{self.base_url}/login/',
+        response = self._request(
+            'POST', '/login/',
             json={'username': username, 'password': password}
         )
         if response.status_code == 200:
             data = response.json()
-            self.token = data.get('token')
+            self._start_session(data)
             return data
         else:
             raise Exception(response.json().get('error', 'Login failed'))
     
-    def upload_csv(self, file_path: str) -> Dict:
-        """Upload CSV file"""
+    def logout(self):
+        """Forget the current token and revoke it on the server"""
+        token = self.token
+        self.end_session()
+        self.revoke_token(token)
+    
+    def revoke_token(self, token: Optional[str]):
+        """Revoke a token on the server"""
+        if not token:
+            return
+        self._request('POST', '/logout/', headers={'Authorization': f'Token {token}'})
+    
+    def upload_csv(
+        self,
+        file_path: str,
+        progress: Optional[Progress] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Dict:
+        """Upload CSV file
+        
+        The file is streamed in chunks, reporting bytes sent to
+        progress(sent, total); once is_cancelled() returns True the transfer
+        is aborted and Cancelled is raised.
+        """
         if not self.token:
             raise Exception('Not authenticated')
         
-        with open(file_path, 'rb') as f:
-            files = {'file': (os.path.basename(file_path), f, 'text/csv')}
-            headers = {'Authorization': f'Token {self.token}'}
-            response = requests.post(
-                f'{self.base_url}/upload/',
-                files=files,
-                headers=headers
+        with MultipartFileStream(
+            'file', file_path, 'text/csv',
+            progress=progress, is_cancelled=is_cancelled, cancel_error=Cancelled
+        ) as body:
+            headers = {
+                'Authorization': f'Token {self.token}',
+                'Content-Type': body.content_type,
+            }
+            response = self._request(
+                'POST', '/upload/',
+                data=body,
+                headers=headers,
+                timeout=self.long_timeout
             )
         
+        self._check_auth(response)
         if response.status_code == 201:
             return response.json()
         else:
             raise Exception(response.json().get('error', 'Upload failed'))
     
+    def cached_history(self) -> Optional[List[Dict]]:
+        """History as last fetched, without contacting the server"""
+        scope = self._cache_scope()
+        entry = self.cache.get_history(scope) if scope else None
+        return entry[1] if entry else None
+    
     def get_history(self) -> List[Dict]:
-        """Get upload history"""
+        """Get upload history (revalidating the cached copy, if any)"""
         if not self.token:
             raise Exception('Not authenticated')
         
-        response = requests.get(
-            f'{self.base_url}/history/',
-            headers=self._get_headers()
+        scope = self._cache_scope()
+        entry = self.cache.get_history(scope) if scope else None
+        headers = self._get_headers()
+        if entry:
+            headers['If-None-Match'] = entry[0]
+        response = self._request(
+            'GET', '/history/',
+            headers=headers
         )
         
+        self._check_auth(response)
+        if response.status_code == 304 and entry:
+            self.cache.touch_history(scope)
+            return entry[1]
         if response.status_code == 200:
-            return response.json()
+            history = response.json()
+            if scope:
+                self.cache.put_history(scope, response.headers.get('ETag', ''), history)
+                # Summaries dropped from the history were deleted on the server
+                self.cache.prune(scope, [item['id'] for item in history])
+            return history
         else:
             raise Exception('Failed to fetch history')
     
+    def cached_summary(self, summary_id: int) -> Optional[Dict]:
+        """Summary as last fetched, without contacting the server"""
+        scope = self._cache_scope()
+        entry = self.cache.get_summary(scope, summary_id) if scope else None
+        return entry[1] if entry else None
+    
     def get_summary(self, summary_id: int) -> Dict:
-        """Get dataset summary"""
+        """Get dataset summary (revalidating the cached copy, if any)"""
         if not self.token:
             raise Exception('Not authenticated')
         
-        response = requests.get(
-            f'{self.base_url}/summary/{summary_id}/',
-            headers=self._get_headers()
+        scope = self._cache_scope()
+        entry = self.cache.get_summary(scope, summary_id) if scope else None
+        headers = self._get_headers()
+        if entry:
+            headers['If-None-Match'] = entry[0]
+        response = self._request(
+            'GET', f'/summary/{summary_id}/',
+            headers=headers
         )
         
+        self._check_auth(response)
+        if response.status_code == 304 and entry:
+            self.cache.touch_summary(scope, summary_id)
+            return entry[1]
         if response.status_code == 200:
-            return response.json()
+            summary = response.json()
+            if scope:
+                self.cache.put_summary(scope, summary_id, response.headers.get('ETag', ''), summary)
+            return summary
         else:
             raise Exception('Failed to fetch summary')
     
-    def download_pdf(self, summary_id: int, save_path: str):
-        """Download PDF report"""
+    def get_rows(self, summary_id: int, offset: int = 0, limit: int = 100, **filters) -> Dict:
+        """Get a page of dataset rows; results are {'columns': [...], 'data': [[...], ...]}"""
+        if not self.token:
+            raise Exception('Not authenticated')
+        
+        headers = self._get_headers()
+        headers['Accept'] = MSGPACK if msgpack is not None else COLUMNAR_JSON
+        response = self._request(
+            'GET', f'/summary/{summary_id}/rows/',
+            params={'offset': offset, 'limit': limit, **filters},
+            headers=headers
+        )
+        
+        self._check_auth(response)
+        if response.status_code != 200:
+            raise Exception('Failed to fetch rows')
+        if response.headers.get('Content-Type', '').startswith(MSGPACK):
+            return msgpack.unpackb(response.content)
+        return response.json()
+    
+    def download_pdf(
+        self,
+        summary_id: int,
+        save_path: str,
+        progress: Optional[Progress] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ):
+        """Download PDF report, reporting bytes received to progress(done, total)"""
         if not self.token:
             raise Exception('Not authenticated')
         
+        # Reports of a stored dataset never change: reuse the saved copy
+        scope = self._cache_scope()
+        cached_file = self.cache.report_file(scope, summary_id) if scope else None
+        if cached_file is not None:
+            shutil.copyfile(cached_file, save_path)
+            if progress is not None:
+                size = os.path.getsize(save_path)
+                progress(size, size)
+            return
+        
         headers = {'Authorization': f'Token {self.token}'}
-        response = requests.get(
-            f'{self.base_url}/summary/{summary_id}/pdf/',
+        response = self._request(
+            'GET', f'/summary/{summary_id}/pdf/',
             headers=headers,
-            stream=True
+            stream=True,
+            timeout=self.long_timeout
         )
         
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        else:
-            raise Exception('Failed to download PDF')
+        with response:
+            self._check_auth(response)
+            if response.status_code != 200:
+                raise Exception('Failed to download PDF')
+            total = int(response.headers.get('Content-Length') or 0)
+            done = 0
+            try:
+                with open(save_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        if is_cancelled is not None and is_cancelled():
+                            raise Cancelled()
+                        f.write(chunk)
+                        done += len(chunk)
+                        if progress is not None:
+                            progress(done, total)
+            except BaseException:
+                # Never leave a truncated report behind
+                if os.path.exists(save_path):
+                    os.remove(save_path)
+                raise
+        if scope:
+            self.cache.add_report(scope, summary_id, save_path)
 
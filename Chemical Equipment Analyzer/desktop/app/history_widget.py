@@ -5,12 +5,16 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt
 from datetime import datetime
 
+from .workers import TaskRunner
+
 
 class HistoryWidget(QWidget):
-    def __init__(self, api_client, on_view_item_callback):
+    def __init__(self, api_client, on_view_item_callback, tasks=None):
         super().__init__()
         self.api_client = api_client
         self.on_view_item = on_view_item_callback
+        self.tasks = tasks or TaskRunner(self)
+        self.refresh_worker = None
         self.init_ui()
         self.refresh_history()
     
@@ -25,37 +29,81 @@ class HistoryWidget(QWidget):
         header.addWidget(title)
         header.addStretch()
         
-        refresh_btn = QPushButton('Refresh')
-        refresh_btn.clicked.connect(self.refresh_history)
-        header.addWidget(refresh_btn)
+        self.refresh_btn = QPushButton('Refresh')
+        self.refresh_btn.clicked.connect(self.refresh_history)
+        header.addWidget(self.refresh_btn)
         
         layout.addLayout(header)
         
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet('color: gray;')
+        self.status_label.setVisible(False)
+        layout.addWidget(self.status_label)
+        
         # History list
         self.history_list = QListWidget()
         self.history_list.itemDoubleClicked.connect(self.on_item_double_clicked)
         layout.addWidget(self.history_list)
     
     def refresh_history(self):
-        """Load and display history"""
+        """Load history in the background and display it when it arrives"""
+        if self.refresh_worker is not None:
+            self.refresh_worker.cancel()
+        self.refresh_btn.setEnabled(False)
+        if self.history_list.count() == 0 or not self.showing_history():
+            # Saved history (if any) is shown until the server answers
+            cached = self.api_client.cached_history()
+            if cached:
+                self.show_history(cached)
+            else:
+                self.show_message('Loading history...')
+        self.refresh_worker = self.tasks.run(
+            self.api_client.get_history,
+            on_finished=self.on_history_loaded,
+            on_error=self.on_history_error,
+        )
+    
+    def show_message(self, text):
         self.history_list.clear()
+        item = QListWidgetItem(text)
+        item.setFlags(Qt.NoItemFlags)
+        self.history_list.addItem(item)
+    
+    def showing_history(self):
+        first = self.history_list.item(0)
+        return first is not None and first.data(Qt.UserRole) is not None
+    
+    def set_status(self, text):
+        self.status_label.setText(text)
+        self.status_label.setVisible(bool(text))
+    
+    def on_history_loaded(self, history):
+        self.refresh_worker = None
+        self.refresh_btn.setEnabled(True)
+        self.set_status('')
         
-        try:
-            history = self.api_client.get_history()
-            
-            if not history:
-                item = QListWidgetItem('No uploads yet. Upload a CSV file to get started.')
-                item.setFlags(Qt.NoItemFlags)
-                self.history_list.addItem(item)
-                return
-            
-            for item_data in history:
-                item_text = self.format_history_item(item_data)
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, item_data)
-                self.history_list.addItem(item)
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Failed to load history: {str(e)}')
+        if not history:
+            self.show_message('No uploads yet. Upload a CSV file to get started.')
+            return
+        
+        self.show_history(history)
+    
+    def show_history(self, history):
+        self.history_list.clear()
+        for item_data in history:
+            item_text = self.format_history_item(item_data)
+            item = QListWidgetItem(item_text)
+            item.setData(Qt.UserRole, item_data)
+            self.history_list.addItem(item)
+    
+    def on_history_error(self, message):
+        self.refresh_worker = None
+        self.refresh_btn.setEnabled(True)
+        if self.showing_history():
+            self.set_status('Server unavailable, showing saved history')
+            return
+        self.show_message('History could not be loaded.')
+        QMessageBox.critical(self, 'Error', f'Failed to load history: {message}')
     
     def format_history_item(self, item_data):
         """Format history item for display"""
@@ -101,9 +149,13 @@ class HistoryWidget(QWidget):
         if not file_path:
             return
         
-        try:
-            self.api_client.download_pdf(summary_id, file_path)
-            QMessageBox.information(self, 'Success', f'PDF report saved to {file_path}')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Failed to download PDF: {str(e)}')
+        self.tasks.run(
+            self.api_client.download_pdf, summary_id, file_path,
+            on_finished=lambda _: QMessageBox.information(
+                self, 'Success', f'PDF report saved to {file_path}'
+            ),
+            on_error=lambda message: QMessageBox.critical(
+                self, 'Error', f'Failed to download PDF: {message}'
+            ),
+        )
 
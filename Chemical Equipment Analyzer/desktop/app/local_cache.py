@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Default location; override with EQUIPMENT_CACHE_DIR
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.equipment_analyzer')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session (
+    base_url TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    token TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    scope TEXT PRIMARY KEY,
+    etag TEXT NOT NULL,
+    body TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    scope TEXT NOT NULL,
+    summary_id INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    body TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (scope, summary_id)
+);
+CREATE TABLE IF NOT EXISTS reports (
+    scope TEXT NOT NULL,
+    summary_id INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    PRIMARY KEY (scope, summary_id)
+);
+"""
+
+
+class LocalCache:
+    """On-disk cache of history, summaries and PDF reports (SQLite)
+
+    Entries are stored per scope (server URL and user) together with the
+    server's ETag, so they can be revalidated with If-None-Match and still
+    be shown while the server is unreachable. The login session is kept
+    here too, so the app can reopen without logging in again.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.reports_dir = os.path.join(directory, 'reports')
+        os.makedirs(self.reports_dir, exist_ok=True)
+        # Holds the API token: readable by this user only
+        os.chmod(directory, 0o700)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, 'cache.sqlite3'), check_same_thread=False
+        )
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+
+    @classmethod
+    def open_default(cls) -> 'LocalCache':
+        return cls(os.environ.get('EQUIPMENT_CACHE_DIR', DEFAULT_CACHE_DIR))
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[Tuple]:
+        with self._lock:
+            return self._db.execute(sql, tuple(params)).fetchall()
+
+    def _execute(self, sql: str, params: Iterable = ()):
+        with self._lock, self._db:
+            self._db.execute(sql, tuple(params))
+
+    # Session
+
+    def load_session(self, base_url: str) -> Optional[Tuple[str, str]]:
+        """(username, token) saved for a server, if any"""
+        rows = self._query('SELECT username, token FROM session WHERE base_url = ?', [base_url])
+        return rows[0] if rows else None
+
+    def save_session(self, base_url: str, username: str, token: str):
+        self._execute(
+            'INSERT OR REPLACE INTO session (base_url, username, token) VALUES (?, ?, ?)',
+            [base_url, username, token]
+        )
+
+    def clear_session(self, base_url: str):
+        self._execute('DELETE FROM session WHERE base_url = ?', [base_url])
+
+    # History and summaries
+
+    def get_history(self, scope: str) -> Optional[Tuple[str, List[Dict], float]]:
+        """(etag, history, fetched_at) or None"""
+        rows = self._query('SELECT etag, body, fetched_at FROM history WHERE scope = ?', [scope])
+        if not rows:
+            return None
+        etag, body, fetched_at = rows[0]
+        return etag, json.loads(body), fetched_at
+
+    def put_history(self, scope: str, etag: str, history: List[Dict]):
+        self._execute(
+            'INSERT OR REPLACE INTO history (scope, etag, body, fetched_at) VALUES (?, ?, ?, ?)',
+            [scope, etag, json.dumps(history), time.time()]
+        )
+
+    def get_summary(self, scope: str, summary_id: int) -> Optional[Tuple[str, Dict, float]]:
+        """(etag, summary, fetched_at) or None"""
+        rows = self._query(
+            'SELECT etag, body, fetched_at FROM summaries WHERE scope = ? AND summary_id = ?',
+            [scope, summary_id]
+        )
+        if not rows:
+            return None
+        etag, body, fetched_at = rows[0]
+        return etag, json.loads(body), fetched_at
+
+    def put_summary(self, scope: str, summary_id: int, etag: str, summary: Dict):
+        self._execute(
+            'INSERT OR REPLACE INTO summaries (scope, summary_id, etag, body, fetched_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [scope, summary_id, etag, json.dumps(summary), time.time()]
+        )
+
+    def touch_history(self, scope: str):
+        """Record that the cached history was just revalidated"""
+        self._execute('UPDATE history SET fetched_at = ? WHERE scope = ?', [time.time(), scope])
+
+    def touch_summary(self, scope: str, summary_id: int):
+        """Record that a cached summary was just revalidated"""
+        self._execute(
+            'UPDATE summaries SET fetched_at = ? WHERE scope = ? AND summary_id = ?',
+            [time.time(), scope, summary_id]
+        )
+
+    # PDF reports
+
+    def report_file(self, scope: str, summary_id: int) -> Optional[str]:
+        rows = self._query(
+            'SELECT file FROM reports WHERE scope = ? AND summary_id = ?', [scope, summary_id]
+        )
+        if rows and os.path.exists(rows[0][0]):
+            return rows[0][0]
+        return None
+
+    def add_report(self, scope: str, summary_id: int, source_path: str):
+        """Keep a copy of a downloaded report"""
+        key = hashlib.sha1(scope.encode('utf-8')).hexdigest()[:16]
+        path = os.path.join(self.reports_dir, f'{key}-{summary_id}.pdf')
+        tmp_path = f'{path}.tmp'
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        self._execute(
+            'INSERT OR REPLACE INTO reports (scope, summary_id, file) VALUES (?, ?, ?)',
+            [scope, summary_id, path]
+        )
+
+    def prune(self, scope: str, keep_ids: Iterable[int]):
+        """Drop summaries and reports no longer in the user's history"""
+        keep = set(keep_ids)
+        for (summary_id,) in self._query('SELECT summary_id FROM summaries WHERE scope = ?', [scope]):
+            if summary_id not in keep:
+                self._execute(
+                    'DELETE FROM summaries WHERE scope = ? AND summary_id = ?', [scope, summary_id]
+                )
+        for summary_id, path in self._query(
+            'SELECT summary_id, file FROM reports WHERE scope = ?', [scope]
+        ):
+            if summary_id not in keep:
+                self._execute(
+                    'DELETE FROM reports WHERE scope = ? AND summary_id = ?', [scope, summary_id]
+                )
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -4,12 +4,15 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from .api_client import APIClient
+from .workers import TaskRunner
 
 
 class LoginDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, api_client=None):
         super().__init__(parent)
-        self.api_client = APIClient()
+        # Share the caller's client so its pooled connection is reused
+        self.api_client = api_client or APIClient()
+        self.tasks = TaskRunner(self)
         self.token = None
         self.init_ui()
     
@@ -52,12 +55,12 @@ class LoginDialog(QDialog):
         
         # Buttons
         button_layout = QHBoxLayout()
-        login_btn = QPushButton('Login / Register')
-        login_btn.clicked.connect(self.handle_login)
+        self.login_btn = QPushButton('Login / Register')
+        self.login_btn.clicked.connect(self.handle_login)
         cancel_btn = QPushButton('Cancel')
         cancel_btn.clicked.connect(self.reject)
         
-        button_layout.addWidget(login_btn)
+        button_layout.addWidget(self.login_btn)
         button_layout.addWidget(cancel_btn)
         layout.addLayout(button_layout)
         
@@ -72,15 +75,41 @@ class LoginDialog(QDialog):
             QMessageBox.warning(self, 'Error', 'Username and password are required')
             return
         
-        try:
-            if self.register_checkbox.isChecked():
-                result = self.api_client.register(username, password, email)
-                QMessageBox.information(self, 'Success', 'Registration successful!')
-            else:
-                result = self.api_client.login(username, password)
-            
-            self.token = result.get('token')
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Authentication failed: {str(e)}')
+        registering = self.register_checkbox.isChecked()
+        self.login_btn.setEnabled(False)
+        if registering:
+            call = self.api_client.register, username, password, email
+        else:
+            call = self.api_client.login, username, password
+        self.tasks.run(
+            self.authenticate, *call,
+            on_finished=lambda result: self.on_authenticated(result, registering),
+            on_error=self.on_auth_error,
+        )
+    
+    def authenticate(self, call, *args, is_cancelled=None):
+        """Run the login/register call (on a worker thread)"""
+        result = call(*args)
+        if is_cancelled is not None and is_cancelled():
+            # The dialog was cancelled while the call was in flight
+            self.api_client.logout()
+        return result
+    
+    def on_authenticated(self, result, registered):
+        self.login_btn.setEnabled(True)
+        if registered:
+            QMessageBox.information(self, 'Success', 'Registration successful!')
+        self.token = result.get('token')
+        self.accept()
+    
+    def on_auth_error(self, message):
+        self.login_btn.setEnabled(True)
+        QMessageBox.critical(self, 'Error', f'Authentication failed: {message}')
+    
+    def reject(self):
+        # A login still in flight must not log in after the dialog closed,
+        # nor leave a saved session to be restored on the next start
+        self.tasks.cancel_all()
+        self.api_client.end_session()
+        super().reject()
 
@@ -1,34 +1,45 @@
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget,
-    QPushButton, QLabel, QMessageBox, QFileDialog, QTableWidget,
-    QTableWidgetItem, QHeaderView, QGroupBox, QGridLayout
+    QPushButton, QLabel, QMessageBox, QFileDialog, QTableView,
+    QHeaderView, QGroupBox, QGridLayout, QProgressBar
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import numpy as np
+import os
 from datetime import datetime
 
 from .login_dialog import LoginDialog
 from .api_client import APIClient
 from .history_widget import HistoryWidget
+from .local_cache import LocalCache
+from .table_model import ColumnarTableModel, CsvRowSource, RecordsRowSource, ServerRowSource
+from .workers import TaskRunner
 
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.api_client = APIClient()
+        self.api_client = APIClient(cache=LocalCache.open_default())
+        self.tasks = TaskRunner(self)
+        self.tasks.auth_required.connect(self.on_auth_required)
         self.current_data = None
+        self.upload_worker = None
+        self.summary_worker = None
+        self.table_model = None
+        self.uploaded_files = {}  # summary id -> local CSV path
+        self.relogin_pending = False
         self.init_ui()
     
     def init_ui(self):
         self.setWindowTitle('Chemical Equipment Analyzer')
         self.setGeometry(100, 100, 1200, 800)
         
-        # Check if authenticated
-        if not self.api_client.token:
+        # Check if authenticated (or still logged in from the last run)
+        if not self.api_client.token and not self.api_client.restore_session():
             self.show_login()
             return
         
@@ -58,9 +69,12 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         self.tabs.addTab(self.create_upload_tab(), 'Upload CSV')
         self.tabs.addTab(self.create_visualization_tab(), 'Visualization')
-        self.tabs.addTab(HistoryWidget(self.api_client, self.on_view_history_item), 'History')
+        self.tabs.addTab(
+            HistoryWidget(self.api_client, self.on_view_history_item, self.tasks), 'History'
+        )
         
         layout.addWidget(self.tabs)
+        self.statusBar().showMessage('Ready')
     
     def create_upload_tab(self):
         widget = QWidget()
@@ -73,10 +87,20 @@ class MainWindow(QMainWindow):
         info_label.setWordWrap(True)
         layout.addWidget(info_label)
         
-        upload_btn = QPushButton('Select CSV File')
-        upload_btn.setMinimumHeight(50)
-        upload_btn.clicked.connect(self.upload_file)
-        layout.addWidget(upload_btn)
+        self.upload_btn = QPushButton('Select CSV File')
+        self.upload_btn.setMinimumHeight(50)
+        self.upload_btn.clicked.connect(self.upload_file)
+        layout.addWidget(self.upload_btn)
+        
+        self.upload_progress = QProgressBar()
+        self.upload_progress.setRange(0, 100)
+        self.upload_progress.setVisible(False)
+        layout.addWidget(self.upload_progress)
+        
+        self.cancel_upload_btn = QPushButton('Cancel Upload')
+        self.cancel_upload_btn.setEnabled(False)
+        self.cancel_upload_btn.clicked.connect(self.cancel_upload)
+        layout.addWidget(self.cancel_upload_btn)
         
         layout.addStretch()
         return widget
@@ -93,7 +117,7 @@ class MainWindow(QMainWindow):
         return widget
     
     def show_login(self):
-        dialog = LoginDialog(self)
+        dialog = LoginDialog(self, self.api_client)
         if dialog.exec_() == LoginDialog.Accepted:
             self.api_client.set_token(dialog.token)
             self.setup_main_ui()
@@ -101,8 +125,31 @@ class MainWindow(QMainWindow):
             self.close()
     
     def logout(self):
-        self.api_client.set_token(None)
+        self.tasks.cancel_all()
+        # Forget the token right away; revoking it on the server may take a
+        # while (or fail when offline) and must not hold up the login dialog
+        token = self.api_client.token
+        self.api_client.end_session()
+        self.tasks.run(self.api_client.revoke_token, token)
+        self.show_login()
+    
+    def on_auth_required(self, message):
+        """The saved or current token was rejected: log in again"""
+        if self.relogin_pending:
+            # Several requests can fail at once; ask only once
+            return
+        self.relogin_pending = True
+        self.tasks.cancel_all()
+        self.upload_worker = None
+        self.summary_worker = None
+        QMessageBox.warning(self, 'Logged Out', message)
         self.show_login()
+        self.relogin_pending = False
+    
+    def closeEvent(self, event):
+        self.tasks.cancel_all()
+        self.tasks.wait(2000)
+        super().closeEvent(event)
     
     def upload_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -112,36 +159,113 @@ class MainWindow(QMainWindow):
         if not file_path:
             return
         
-        try:
-            data = self.api_client.upload_csv(file_path)
-            self.current_data = data
-            self.update_visualization(data)
-            self.tabs.setCurrentIndex(1)  # Switch to visualization tab
-            
-            # Refresh history tab
-            history_widget = self.tabs.widget(2)
-            if isinstance(history_widget, HistoryWidget):
-                history_widget.refresh_history()
-            
-            QMessageBox.information(self, 'Success', 'File uploaded and analyzed successfully!')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Failed to upload file: {str(e)}')
+        self.upload_btn.setEnabled(False)
+        self.cancel_upload_btn.setEnabled(True)
+        self.upload_progress.setRange(0, 100)
+        self.upload_progress.setValue(0)
+        self.upload_progress.setFormat('%p%')
+        self.upload_progress.setVisible(True)
+        self.statusBar().showMessage(f'Uploading {os.path.basename(file_path)}...')
+        self.upload_worker = self.tasks.run(
+            self.api_client.upload_csv, file_path,
+            on_progress=self.on_upload_progress,
+            on_finished=lambda data: self.on_upload_finished(data, file_path),
+            on_error=self.on_upload_error,
+            on_cancelled=self.on_upload_cancelled,
+        )
+    
+    def cancel_upload(self):
+        if self.upload_worker is not None:
+            self.upload_worker.cancel()
+            self.statusBar().showMessage('Cancelling upload...')
+    
+    def on_upload_progress(self, sent, total):
+        if sent < total:
+            self.upload_progress.setValue(sent * 100 // total)
+            self.upload_progress.setFormat(f'%p%  ({sent // 2 ** 20} of {total // 2 ** 20} MB)')
+        else:
+            # Everything is sent; the server is analyzing the file
+            self.upload_progress.setRange(0, 0)
+            self.statusBar().showMessage('Analyzing on the server...')
+    
+    def _upload_done(self, message):
+        self.upload_worker = None
+        self.upload_progress.setVisible(False)
+        self.upload_btn.setEnabled(True)
+        self.cancel_upload_btn.setEnabled(False)
+        self.statusBar().showMessage(message)
+    
+    def on_upload_finished(self, data, file_path=None):
+        self._upload_done('Upload complete')
+        if file_path:
+            self.uploaded_files[data['id']] = file_path
+        self.current_data = data
+        self.update_visualization(data)
+        self.tabs.setCurrentIndex(1)  # Switch to visualization tab
+        
+        # Refresh history tab
+        history_widget = self.tabs.widget(2)
+        if isinstance(history_widget, HistoryWidget):
+            history_widget.refresh_history()
+        
+        QMessageBox.information(self, 'Success', 'File uploaded and analyzed successfully!')
+    
+    def on_upload_error(self, message):
+        self._upload_done('Upload failed')
+        QMessageBox.critical(self, 'Error', f'Failed to upload file: {message}')
+    
+    def on_upload_cancelled(self):
+        self._upload_done('Upload cancelled')
     
     def on_view_history_item(self, item):
         """Called when user clicks on a history item"""
-        try:
-            data = self.api_client.get_summary(item['id'])
-            self.current_data = data
-            self.update_visualization(data)
-            self.tabs.setCurrentIndex(1)  # Switch to visualization tab
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Failed to load summary: {str(e)}')
+        if self.summary_worker is not None:
+            # Only the most recently opened item is shown
+            self.summary_worker.cancel()
+        
+        # Show the saved copy right away, then check it with the server
+        cached = self.api_client.cached_summary(item['id'])
+        if cached is not None:
+            self.show_summary(cached)
+            self.statusBar().showMessage('Checking for updates...')
+        else:
+            self.statusBar().showMessage(f"Loading {item.get('filename', 'summary')}...")
+        self.summary_worker = self.tasks.run(
+            self.api_client.get_summary, item['id'],
+            on_finished=self.on_summary_loaded,
+            on_error=lambda message: self.on_summary_error(message, cached),
+        )
+    
+    def show_summary(self, data):
+        self.current_data = data
+        self.update_visualization(data)
+        self.tabs.setCurrentIndex(1)  # Switch to visualization tab
+    
+    def on_summary_loaded(self, data):
+        self.summary_worker = None
+        self.statusBar().showMessage('Ready')
+        if data != self.current_data:
+            self.show_summary(data)
+    
+    def on_summary_error(self, message, cached=None):
+        self.summary_worker = None
+        if cached is not None:
+            self.statusBar().showMessage('Server unavailable, showing saved summary')
+            return
+        self.statusBar().showMessage('Ready')
+        QMessageBox.critical(self, 'Error', f'Failed to load summary: {message}')
     
     def update_visualization(self, data):
         """Update visualization tab with data"""
         # Clear existing widgets
+        if self.table_model is not None:
+            self.table_model.cancel()
+            self.table_model = None
         for i in reversed(range(self.viz_layout.count())):
-            self.viz_layout.itemAt(i).widget().setParent(None)
+            widget = self.viz_layout.takeAt(i).widget()
+            # The trailing stretch has no widget
+            if widget is not None:
+                widget.setParent(None)
         
         # Stats cards
         stats_group = QGroupBox('Summary Statistics')
@@ -205,29 +329,25 @@ class MainWindow(QMainWindow):
             dist_fig.tight_layout()
             self.viz_layout.addWidget(dist_canvas)
         
-        # Data table
-        if 'raw_data' in data and data['raw_data']:
-            table_group = QGroupBox('Data Table (First 100 rows)')
-            table_layout = QVBoxLayout()
-            
-            table = QTableWidget()
-            table.setRowCount(len(data['raw_data']))
-            table.setColumnCount(5)
-            table.setHorizontalHeaderLabels([
-                'Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'
-            ])
-            
-            for i, row in enumerate(data['raw_data']):
-                table.setItem(i, 0, QTableWidgetItem(str(row.get('Equipment Name', ''))))
-                table.setItem(i, 1, QTableWidgetItem(str(row.get('Type', ''))))
-                table.setItem(i, 2, QTableWidgetItem(str(row.get('Flowrate', ''))))
-                table.setItem(i, 3, QTableWidgetItem(str(row.get('Pressure', ''))))
-                table.setItem(i, 4, QTableWidgetItem(str(row.get('Temperature', ''))))
-            
-            table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-            table_layout.addWidget(table)
-            table_group.setLayout(table_layout)
-            self.viz_layout.addWidget(table_group)
+        # Data table: only the rows scrolled into view are loaded
+        self.table_group = QGroupBox('Data Table')
+        table_layout = QVBoxLayout()
+        
+        self.table_view = QTableView()
+        self.table_view.setMinimumHeight(300)
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Uniform row heights keep scrolling through millions of rows cheap
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        # No sort until a header is clicked
+        self.table_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table_view.setSortingEnabled(True)
+        self.set_table_source(
+            ServerRowSource(self.api_client, data['id']), data.get('total_equipment_count', 0)
+        )
+        
+        table_layout.addWidget(self.table_view)
+        self.table_group.setLayout(table_layout)
+        self.viz_layout.addWidget(self.table_group)
         
         # Download PDF button
         download_btn = QPushButton('Download PDF Report')
@@ -236,6 +356,52 @@ class MainWindow(QMainWindow):
         
         self.viz_layout.addStretch()
     
+    def set_table_source(self, source, row_count=0):
+        if self.table_model is not None:
+            self.table_model.cancel()
+        self.table_model = ColumnarTableModel(source, row_count, self.tasks, self)
+        self.table_model.load_failed.connect(
+            lambda message, model=self.table_model: self.on_rows_error(model, message)
+        )
+        self.table_view.setModel(self.table_model)
+        header = self.table_view.horizontalHeader()
+        if header.sortIndicatorSection() >= 0:
+            # Keep the user's sort when switching to another source
+            self.table_model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+    
+    def on_rows_error(self, model, message):
+        if model is not self.table_model:
+            return
+        if not isinstance(model.source, ServerRowSource) or model.pages_loaded:
+            self.statusBar().showMessage(f'Failed to load rows: {message}')
+            return
+        
+        # Rows are not stored on the server: browse the uploaded file if it
+        # is on this machine, or else the sample that came with the summary
+        data = self.current_data
+        file_path = self.uploaded_files.get(data['id'])
+        if file_path and os.path.exists(file_path):
+            self.statusBar().showMessage(f'Reading {os.path.basename(file_path)}...')
+            self.tasks.run(
+                CsvRowSource, file_path,
+                on_finished=lambda source: self.on_local_rows(model, source),
+                on_error=lambda _: self.show_sample_rows(model),
+            )
+        else:
+            self.show_sample_rows(model)
+    
+    def on_local_rows(self, model, source):
+        if model is self.table_model:
+            self.statusBar().showMessage('Ready')
+            self.table_group.setTitle(f'Data Table ({os.path.basename(source.file_path)})')
+            self.set_table_source(source, source.rows)
+    
+    def show_sample_rows(self, model):
+        if model is self.table_model:
+            rows = self.current_data.get('raw_data') or []
+            self.table_group.setTitle(f'Data Table (First {len(rows)} rows)')
+            self.set_table_source(RecordsRowSource(rows), len(rows))
+    
     def download_pdf(self, summary_id):
         """Download PDF report"""
         file_path, _ = QFileDialog.getSaveFileName(
@@ -245,9 +411,25 @@ class MainWindow(QMainWindow):
         if not file_path:
             return
         
-        try:
-            self.api_client.download_pdf(summary_id, file_path)
-            QMessageBox.information(self, 'Success', f'PDF report saved to {file_path}')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Failed to download PDF: {str(e)}')
+        self.statusBar().showMessage('Downloading PDF report...')
+        self.tasks.run(
+            self.api_client.download_pdf, summary_id, file_path,
+            on_progress=self.on_download_progress,
+            on_finished=lambda _: self.on_download_finished(file_path),
+            on_error=self.on_download_error,
+        )
+    
+    def on_download_progress(self, done, total):
+        if total:
+            self.statusBar().showMessage(f'Downloading PDF report... {done * 100 // total}%')
+        else:
+            self.statusBar().showMessage(f'Downloading PDF report... {done // 1024} KB')
+    
+    def on_download_finished(self, file_path):
+        self.statusBar().showMessage('Ready')
+        QMessageBox.information(self, 'Success', f'PDF report saved to {file_path}')
+    
+    def on_download_error(self, message):
+        self.statusBar().showMessage('Ready')
+        QMessageBox.critical(self, 'Error', f'Failed to download PDF: {message}')
 
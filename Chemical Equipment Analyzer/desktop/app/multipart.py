@@ -0,0 +1,90 @@
+import os
+import uuid
+from typing import Callable, Optional
+
+# Bytes read from the file per read() call
+CHUNK_SIZE = 1024 * 1024
+
+# Progress is reported about this many times per upload
+PROGRESS_STEPS = 1000
+
+
+class MultipartFileStream:
+    """multipart/form-data body with one file field, read in chunks
+
+    requests streams file-like bodies with a known length, so a file of any
+    size is sent with constant memory. Reads report the bytes sent so far to
+    progress(sent, total) about PROGRESS_STEPS times per upload, and raise
+    cancel_error() once is_cancelled() returns True, which aborts the request
+    mid-transfer.
+    """
+
+    def __init__(
+        self,
+        field: str,
+        file_path: str,
+        content_type: str = 'application/octet-stream',
+        progress: Optional[Callable[[int, int], None]] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+        cancel_error: Callable[[], Exception] = Exception,
+    ):
+        self.boundary = uuid.uuid4().hex
+        # Quotes would end the quoted filename early (HTML form encoding)
+        filename = os.path.basename(file_path).replace('"', '%22')
+        self._head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+        self._file = open(file_path, 'rb')
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        self._parts = [self._head, None, self._tail]
+        self._sent = 0
+        self._reported = 0
+        self._report_every = max(len(self) // PROGRESS_STEPS, 1)
+        self.progress = progress
+        self.is_cancelled = is_cancelled
+        self.cancel_error = cancel_error
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self) -> int:
+        return len(self._head) + self._file_size + len(self._tail)
+
+    def read(self, size: int = -1) -> bytes:
+        if self.is_cancelled is not None and self.is_cancelled():
+            raise self.cancel_error()
+        if size is None or size < 0:
+            size = CHUNK_SIZE
+        data = b''
+        while self._parts and not data:
+            part = self._parts[0]
+            if part is None:
+                data = self._file.read(min(size, CHUNK_SIZE))
+                if not data:
+                    self._parts.pop(0)
+            else:
+                data, rest = part[:size], part[size:]
+                if rest:
+                    self._parts[0] = rest
+                else:
+                    self._parts.pop(0)
+        self._sent += len(data)
+        if self.progress is not None and data and (
+            self._sent - self._reported >= self._report_every or self._sent == len(self)
+        ):
+            self._reported = self._sent
+            self.progress(self._sent, len(self))
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,312 @@
+import csv
+import io
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer, pyqtSignal
+
+from .workers import TaskRunner
+
+COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Rows per fetched page (the server returns at most 1000)
+PAGE_SIZE = 500
+
+# Pages kept in memory; the least recently shown are dropped first
+MAX_PAGES = 40
+
+# Page requests in flight; older ones are abandoned while scrolling fast
+MAX_PENDING = 4
+
+# Bytes scanned per read while indexing a local file
+SCAN_BLOCK = 4 * 1024 * 1024
+
+# A page: total matching rows and {column: array of values}
+Page = Tuple[int, Dict[str, np.ndarray]]
+
+
+def _columnar_page(count: int, columns: List[str], data: List[List]) -> Page:
+    arrays = {}
+    for name, values in zip(columns, data):
+        if name in NUMERIC_COLUMNS:
+            arrays[name] = np.asarray(values, dtype=np.float64)
+        else:
+            arrays[name] = np.asarray(values, dtype=object)
+    return count, arrays
+
+
+class ServerRowSource:
+    """Pages of a stored dataset, sorted by the server"""
+
+    def __init__(self, api_client, summary_id: int):
+        self.api_client = api_client
+        self.summary_id = summary_id
+
+    def fetch(self, offset: int, limit: int, sort: Optional[str] = None,
+              descending: bool = False) -> Page:
+        filters = {'sort': ('-' if descending else '') + sort} if sort else {}
+        page = self.api_client.get_rows(self.summary_id, offset, limit, **filters)
+        results = page['results']
+        return _columnar_page(page['count'], results['columns'], results['data'])
+
+
+class RecordsRowSource:
+    """Pages of rows already in memory (e.g. the raw_data sample of a summary)"""
+
+    def __init__(self, records: List[Dict]):
+        self.rows = len(records)
+        self.columns = _columnar_page(
+            self.rows, COLUMNS, [[record.get(col) for record in records] for col in COLUMNS]
+        )[1]
+        self._orders = {}
+
+    def _order(self, sort: str) -> np.ndarray:
+        if sort not in self._orders:
+            keys = self.columns[sort]
+            if keys.dtype == object:
+                keys = keys.astype(str)
+            self._orders[sort] = np.argsort(keys, kind='stable')
+        return self._orders[sort]
+
+    def fetch(self, offset: int, limit: int, sort: Optional[str] = None,
+              descending: bool = False) -> Page:
+        order = self._order(sort) if sort else np.arange(self.rows)
+        if descending:
+            order = order[::-1]
+        indices = order[offset:offset + limit]
+        return self.rows, {col: values[indices] for col, values in self.columns.items()}
+
+
+class CsvRowSource:
+    """Pages of a local CSV file, read on demand
+
+    Only the byte offset of every line is kept (8 bytes per row); a page is
+    read by seeking to its lines. Sorting loads just the sort column once
+    and keeps its argsort, so the rows themselves are never copied.
+    Quoted fields must not contain line breaks.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            header = f.readline()
+            fields = next(csv.reader([header.decode('utf-8-sig')]))
+            # Headers match case-insensitively, as on the server (first match wins)
+            lookup = {}
+            for position, name in enumerate(fields):
+                lookup.setdefault(name.strip().lower(), position)
+            missing = [col for col in COLUMNS if col.lower() not in lookup]
+            if missing:
+                raise Exception(f"Missing required columns: {', '.join(missing)}")
+            self._positions = {col: lookup[col.lower()] for col in COLUMNS}
+            self._starts = self._index_lines(f, len(header))
+        self.rows = len(self._starts) - 1
+        self._orders = {}
+
+    @staticmethod
+    def _index_lines(f, start: int) -> np.ndarray:
+        """Offsets where each data line starts, plus the end of the last line"""
+        blocks = [np.array([start], dtype=np.int64)]
+        position = start
+        last = b'\n'
+        while True:
+            block = f.read(SCAN_BLOCK)
+            if not block:
+                break
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10)
+            blocks.append(newlines.astype(np.int64) + position + 1)
+            position += len(block)
+            last = block[-1:]
+        starts = np.concatenate(blocks)
+        if last != b'\n':
+            # Last line has no trailing newline
+            starts = np.append(starts, position)
+        # Drop blank lines at the end (a data line has at least four commas)
+        while len(starts) > 1 and starts[-1] - starts[-2] <= 2:
+            starts = starts[:-1]
+        return starts
+
+    def _order(self, sort: str) -> np.ndarray:
+        if sort not in self._orders:
+            keys = pd.read_csv(
+                self.file_path, usecols=[self._positions[sort]], skipinitialspace=True
+            ).iloc[:, 0]
+            if sort in NUMERIC_COLUMNS:
+                keys = pd.to_numeric(keys, errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                keys = keys.astype(str).to_numpy()
+            self._orders[sort] = np.argsort(keys, kind='stable')
+        return self._orders[sort]
+
+    def fetch(self, offset: int, limit: int, sort: Optional[str] = None,
+              descending: bool = False) -> Page:
+        if sort is None and not descending:
+            indices = np.arange(offset, min(offset + limit, self.rows))
+        else:
+            order = self._order(sort) if sort else np.arange(self.rows)
+            if descending:
+                order = order[::-1]
+            indices = order[offset:offset + limit]
+
+        lines = []
+        with open(self.file_path, 'rb') as f:
+            if len(indices) and indices[-1] - indices[0] == len(indices) - 1:
+                # Natural order: one read for the whole page
+                f.seek(self._starts[indices[0]])
+                lines = f.read(self._starts[indices[-1] + 1] - self._starts[indices[0]]).splitlines()
+            else:
+                for i in indices:
+                    f.seek(self._starts[i])
+                    lines.append(f.read(self._starts[i + 1] - self._starts[i]).rstrip(b'\r\n'))
+        reader = csv.reader(io.StringIO(b'\n'.join(lines).decode('utf-8', errors='replace')))
+        data = [[] for _ in COLUMNS]
+        for values in reader:
+            for column, position in zip(data, self._positions.values()):
+                value = values[position].strip() if position < len(values) else ''
+                column.append(value)
+        for i, col in enumerate(COLUMNS):
+            if col in NUMERIC_COLUMNS:
+                data[i] = pd.to_numeric(pd.Series(data[i], dtype=object), errors='coerce').tolist()
+        return _columnar_page(self.rows, COLUMNS, data)
+
+
+class ColumnarTableModel(QAbstractTableModel):
+    """Table model that loads rows a page at a time as the view shows them
+
+    Pages are fetched from a row source (ServerRowSource, CsvRowSource or
+    RecordsRowSource) on the task runner and kept as column arrays in a
+    bounded LRU, so memory stays constant however many rows there are.
+    Sorting is delegated to the source and only resets the loaded pages.
+    Without a task runner, pages are fetched synchronously.
+    """
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, source, row_count: int = 0, tasks: Optional[TaskRunner] = None, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.tasks = tasks
+        self._count = row_count
+        self.pages_loaded = 0
+        self._sort: Optional[str] = None
+        self._descending = False
+        self._generation = 0
+        self._pages: 'OrderedDict[int, Dict[str, np.ndarray]]' = OrderedDict()
+        self._pending = OrderedDict()
+        # The first page also tells how many rows there are
+        self._request_page(0)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return str(section + 1)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = COLUMNS[index.column()]
+        if role == Qt.TextAlignmentRole:
+            if column in NUMERIC_COLUMNS:
+                return int(Qt.AlignRight | Qt.AlignVCenter)
+            return None
+        if role != Qt.DisplayRole:
+            return None
+
+        page_number, row = divmod(index.row(), PAGE_SIZE)
+        page = self._pages.get(page_number)
+        if page is None:
+            self._request_page(page_number)
+            # Without a task runner the page was loaded just now
+            page = self._pages.get(page_number)
+        if page is None:
+            return 'Loading...' if index.column() == 0 else None
+        self._pages.move_to_end(page_number)
+        values = page[column]
+        if row >= len(values):
+            return None
+        value = values[row]
+        if column in NUMERIC_COLUMNS:
+            return '' if np.isnan(value) else str(float(value))
+        return '' if value is None else str(value)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.beginResetModel()
+        self._sort = COLUMNS[column] if column >= 0 else None
+        self._descending = column >= 0 and order == Qt.DescendingOrder
+        self._generation += 1
+        self._pages.clear()
+        self._cancel_pending()
+        self.endResetModel()
+
+    def cancel(self):
+        """Abandon page requests in flight (e.g. when the view is discarded)"""
+        self._generation += 1
+        self._cancel_pending()
+
+    def _cancel_pending(self):
+        for worker in self._pending.values():
+            worker.cancel()
+        self._pending.clear()
+
+    def _request_page(self, page_number: int):
+        if page_number in self._pending:
+            return
+        args = (page_number * PAGE_SIZE, PAGE_SIZE, self._sort, self._descending)
+        if self.tasks is None:
+            try:
+                self._page_loaded(self._generation, page_number, self.source.fetch(*args))
+            except Exception as e:
+                self.load_failed.emit(str(e))
+            return
+
+        while len(self._pending) >= MAX_PENDING:
+            # Most likely scrolled past already; the newest request matters most.
+            # Refresh its rows later so it is requested again if still shown.
+            stale_number, stale = self._pending.popitem(last=False)
+            stale.cancel()
+            QTimer.singleShot(0, lambda number=stale_number: self._page_changed(number))
+        generation = self._generation
+        self._pending[page_number] = self.tasks.run(
+            self.source.fetch, *args,
+            on_finished=lambda page, number=page_number: self._page_loaded(generation, number, page),
+            on_error=lambda message, number=page_number: self._page_failed(generation, number, message),
+        )
+
+    def _page_loaded(self, generation: int, page_number: int, page: Page):
+        if generation != self._generation:
+            return
+        self._pending.pop(page_number, None)
+        self.pages_loaded += 1
+        count, columns = page
+        self._pages[page_number] = columns
+        while len(self._pages) > MAX_PAGES:
+            self._pages.popitem(last=False)
+
+        if count != self._count:
+            self.beginResetModel()
+            self._count = count
+            self.endResetModel()
+            return
+        self._page_changed(page_number)
+
+    def _page_changed(self, page_number: int):
+        first = page_number * PAGE_SIZE
+        last = min(first + PAGE_SIZE, self._count) - 1
+        if last >= first:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(COLUMNS) - 1))
+
+    def _page_failed(self, generation: int, page_number: int, message: str):
+        if generation != self._generation:
+            return
+        self._pending.pop(page_number, None)
+        self.load_failed.emit(message)
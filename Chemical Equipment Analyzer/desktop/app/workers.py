@@ -0,0 +1,121 @@
+import inspect
+import threading
+from typing import Callable, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from .api_client import AuthenticationRequired, Cancelled
+
+# Network calls running at the same time (the rest wait in the queue)
+MAX_WORKERS = 4
+
+
+class WorkerSignals(QObject):
+    """Signals of an ApiWorker, delivered on the GUI thread"""
+    progress = pyqtSignal('qint64', 'qint64')  # done, total (0 if unknown)
+    finished = pyqtSignal(object)    # result of the call
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    auth_required = pyqtSignal(str)  # the server rejected the token
+
+
+class ApiWorker(QRunnable):
+    """Run one blocking API call on a thread pool thread
+
+    If the function accepts `progress` and/or `is_cancelled` keyword
+    arguments they are passed in: progress(done, total) emits the progress
+    signal and is_cancelled() tells a long-running call to stop. A cancelled
+    worker emits only `cancelled`, whatever the call returned, and a call
+    rejected for an expired token emits only `auth_required`.
+    """
+
+    def __init__(self, fn: Callable, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancel = threading.Event()
+
+        parameters = inspect.signature(fn).parameters
+        if 'progress' in parameters:
+            self.kwargs['progress'] = self.signals.progress.emit
+        if 'is_cancelled' in parameters:
+            self.kwargs['is_cancelled'] = self.is_cancelled
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self):
+        if self.is_cancelled():
+            # Cancelled while still queued: skip the call entirely
+            self.signals.cancelled.emit()
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except AuthenticationRequired as e:
+            self.signals.auth_required.emit(str(e))
+        except Exception as e:
+            if self.is_cancelled():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.error.emit(str(e))
+        else:
+            if self.is_cancelled():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+
+
+class TaskRunner(QObject):
+    """Starts ApiWorkers on a shared pool and keeps track of running ones"""
+    auth_required = pyqtSignal(str)  # any worker's call needs a new login
+
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(MAX_WORKERS)
+        self._active = set()
+
+    def run(
+        self,
+        fn: Callable,
+        *args,
+        on_finished: Optional[Callable] = None,
+        on_error: Optional[Callable] = None,
+        on_progress: Optional[Callable] = None,
+        on_cancelled: Optional[Callable] = None,
+        **kwargs
+    ) -> ApiWorker:
+        """Run fn(*args, **kwargs) in the background; callbacks run on the GUI thread"""
+        worker = ApiWorker(fn, *args, **kwargs)
+        signals = worker.signals
+        if on_finished:
+            signals.finished.connect(on_finished)
+        if on_error:
+            signals.error.connect(on_error)
+        if on_progress:
+            signals.progress.connect(on_progress)
+        if on_cancelled:
+            signals.cancelled.connect(on_cancelled)
+        signals.auth_required.connect(self.auth_required.emit)
+        for signal in (signals.finished, signals.error, signals.cancelled, signals.auth_required):
+            signal.connect(lambda *_, worker=worker: self._active.discard(worker))
+
+        # Referenced until done so its signals object outlives the thread
+        self._active.add(worker)
+        self.pool.start(worker)
+        return worker
+
+    def cancel_all(self):
+        for worker in list(self._active):
+            worker.cancel()
+
+    def wait(self, msecs: int = -1) -> bool:
+        """Block until running workers are done (used on shutdown)"""
+        return self.pool.waitForDone(msecs)
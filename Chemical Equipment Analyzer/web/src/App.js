@@ -7,6 +7,7 @@ import DashboardPage from './pages/DashboardPage';
 import HistoryPage from './pages/HistoryPage';
 import AboutPage from './pages/AboutPage';
 import { getAuthToken, setAuthToken, removeAuthToken } from './utils/auth';
+import { logout } from './utils/api';
 
 function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
@@ -26,6 +27,11 @@ function App() {
   };
 
   const handleLogout = () => {
+    // Revoke the token server-side; log out locally even if that fails
+    const token = getAuthToken();
+    if (token) {
+      logout(token).catch(() => {});
+    }
     removeAuthToken();
     setIsAuthenticated(false);
   };
@@ -41,6 +41,13 @@ export const login = async (username, password) => {
   return response.data;
 };
 
+// The token is passed in: local state may be cleared before the request is sent
+export const logout = async (token) => {
+  await api.post('/logout/', null, {
+    headers: { Authorization: `Token ${token}` },
+  });
+};
+
 export const uploadCSV = async (file) => {
   const formData = new FormData();
   formData.append('file', file);